@@ -14,7 +14,9 @@ def load_data():
     if not os.path.exists(DATA_PATH):
         raise HTTPException(status_code=500, detail=f"Data file not found at {DATA_PATH}")
     with open(DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+        # version of the file actually read, same format as serving/workflow_store.py
+        st = os.fstat(f.fileno())
+        return json.load(f), f"{st.st_mtime_ns:x}-{st.st_size:x}"
 
 @app.get("/health")
 def health():
@@ -22,9 +24,9 @@ def health():
 
 @app.get("/workflows")
 def get_workflows(platform: Optional[str] = Query(None), country: Optional[str] = Query(None), limit: int = Query(50, ge=1, le=100)):
-    data = load_data()
+    data, version = load_data()
     if platform:
         data = [d for d in data if str(d.get("platform","")).lower() == platform.lower()]
     if country:
         data = [d for d in data if str(d.get("country","")).lower() == country.lower()]
-    return JSONResponse(content=data[:limit])
\ No newline at end of file
+    return JSONResponse(content=data[:limit], headers={"X-Dataset-Version": version})
\ No newline at end of file
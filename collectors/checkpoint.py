@@ -0,0 +1,112 @@
+# collectors/checkpoint.py - durable SQLite checkpoint store for resumable collection
+import json, os, re, sqlite3, threading, time
+from datetime import datetime, timezone
+from collectors.records import WorkflowRecord, encode
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    platform TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    region TEXT NOT NULL,
+    collected_ts REAL NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (platform, source_id, region)
+);
+CREATE TABLE IF NOT EXISTS units (
+    unit TEXT PRIMARY KEY,
+    completed_ts REAL NOT NULL,
+    record_keys TEXT NOT NULL
+);
+"""
+
+_YT_ID = re.compile(r"[?&]v=([^&]+)")
+_TOPIC_ID = re.compile(r"/t/([^/.?]+)")
+
+def parse_ts(collected_at):
+    """ISO-8601 'collected_at' (with trailing Z) -> epoch seconds; 0.0 if missing/invalid."""
+    if not collected_at:
+        return 0.0
+    try:
+        dt = datetime.fromisoformat(str(collected_at).rstrip("Z"))
+    except ValueError:
+        return 0.0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def entity_key(platform, source_id, region=None):
+    return (platform, str(source_id), region or "")
+
+def record_key(rec):
+    """(platform, source id, region) for a collected record."""
+    platform = rec.get("platform") or ""
+    url = rec.get("source_url") or ""
+    source_id = None
+    if platform == "YouTube":
+        m = _YT_ID.search(url)
+        source_id = m.group(1) if m else None
+    elif platform == "Discourse":
+        m = _TOPIC_ID.search(url)
+        source_id = m.group(1) if m else None
+    return entity_key(platform, source_id or rec.get("workflow") or url, rec.get("country"))
+
+class CheckpointStore:
+    """
+    Records are upserted (and committed) as they arrive, keyed by
+    (platform, source id, region). Completed units of work (one search for one
+    keyword/region) are recorded with the keys they produced, so an interrupted
+    run resumes without repeating work done within the TTL.
+    """
+    def __init__(self, path, ttl_seconds=3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _cutoff(self):
+        return time.time() - self.ttl_seconds if self.ttl_seconds else float("inf")
+
+    def put_many(self, records):
+        rows = []
+        for rec in records:
+            key = record_key(rec)
+            rows.append(key + (parse_ts(rec.get("collected_at")) or time.time(),
+                               json.dumps(rec, ensure_ascii=False, default=encode)))
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)", rows)
+
+    def complete_unit(self, unit, records):
+        keys = [list(record_key(r)) for r in records]
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO units VALUES (?, ?, ?)",
+                               (unit, time.time(), json.dumps(keys)))
+
+    def fresh_records(self):
+        """All records collected within the TTL, as {key: record}."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT platform, source_id, region, payload FROM records WHERE collected_ts >= ?",
+                (self._cutoff(),)).fetchall()
+        return {(p, s, r): WorkflowRecord.from_dict(json.loads(payload)) for p, s, r, payload in rows}
+
+    def fresh_units(self):
+        """{unit: [record keys]} for units completed within the TTL."""
+        with self._lock:
+            rows = self._conn.execute("SELECT unit, record_keys FROM units WHERE completed_ts >= ?",
+                                      (self._cutoff(),)).fetchall()
+        return {unit: [tuple(k) for k in json.loads(keys)] for unit, keys in rows}
+
+    def all_records(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT payload FROM records ORDER BY collected_ts").fetchall()
+        return [WorkflowRecord.from_dict(json.loads(p)) for (p,) in rows]
@@ -1,8 +1,14 @@
 # collectors/discourse_collector.py
-import os, requests
+import os
 from datetime import datetime
-from dotenv import load_dotenv
-load_dotenv()
+from collectors import http_client
+from collectors.env import load_env
+from collectors.records import WorkflowRecord
+from serving import metrics
+load_env()
+
+MOCK_FALLBACKS = metrics.counter("collector_mock_fallbacks_total", "Records synthesised by mock fallbacks",
+                                 ("platform", "reason"))
 
 DISCOURSE_BASE = os.getenv("DISCOURSE_BASE_URL", "https://forum.n8n.io")
 DISCOURSE_API_KEY = os.getenv("DISCOURSE_API_KEY")    # optional
@@ -25,7 +31,7 @@ def _mock_topic_record(title, topic_id):
     likes = 1 + (h % 50)
     contributors = 1 + (h % 10)
     views = 100 + (h % 5000)
-    return {
+    return WorkflowRecord.from_dict({
         "workflow": title,
         "platform": "Discourse",
         "popularity_metrics": {
@@ -37,7 +43,7 @@ def _mock_topic_record(title, topic_id):
         "country": None,
         "source_url": f"{DISCOURSE_BASE.rstrip('/')}/t/{topic_id}",
         "collected_at": datetime.utcnow().isoformat() + "Z"
-    }
+    })
 
 def search_topics(keyword, limit=5):
     """
@@ -49,7 +55,7 @@ def search_topics(keyword, limit=5):
 
     params = {"q": keyword, "include_blurbs": "true", "order": "posts"}
     try:
-        r = requests.get(SEARCH_URL, params=params, headers=HEADERS, timeout=15)
+        r = http_client.get(SEARCH_URL, params=params, headers=HEADERS, platform="discourse", endpoint="search")
         r.raise_for_status()
         js = r.json()
         # js['topics'] is list of dicts
@@ -60,6 +66,7 @@ def search_topics(keyword, limit=5):
             return out
     except Exception:
         # fallback to mock
+        MOCK_FALLBACKS.inc(limit, platform="discourse", reason="search_error")
         out = []
         for i in range(limit):
             out.append({"topic_id": f"mock_{keyword}_{i}", "title": f"{keyword} discussion {i+1}"})
@@ -81,7 +88,7 @@ def fetch_topic_details(topic_id):
 
     url = TOPIC_URL_TPL.format(topic_id=topic_id)
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
+        r = http_client.get(url, headers=HEADERS, platform="discourse", endpoint="topic")
         r.raise_for_status()
         js = r.json()
         # parse useful fields
@@ -97,7 +104,7 @@ def fetch_topic_details(topic_id):
         # likes: Discourse may expose 'like_count' aggregated for topic
         like_count = topic.get("like_count", 0)
         # fallback: sum likes on posts in post_stream (expensive) - we'll try aggregated first
-        record = {
+        record = WorkflowRecord.from_dict({
             "workflow": topic.get("title") or topic.get("fancy_title") or f"topic {topic_id}",
             "platform": "Discourse",
             "popularity_metrics": {
@@ -109,10 +116,11 @@ def fetch_topic_details(topic_id):
             "country": None,
             "source_url": url,
             "collected_at": datetime.utcnow().isoformat() + "Z"
-        }
+        })
         return record
     except Exception:
         # fallback to mock
+        MOCK_FALLBACKS.inc(platform="discourse", reason="topic_error")
         return _mock_topic_record(f"topic_{topic_id}", topic_id)
 
 def collect_for_keyword(keyword, limit=5):
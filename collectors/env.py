@@ -0,0 +1,27 @@
+# collectors/env.py - .env loading that only imports python-dotenv when there is a file to read
+import os
+
+_loaded = False
+
+def find_env_file(start=None, name=".env"):
+    """Nearest `name` in start (default: this package) or a parent directory, like dotenv.find_dotenv."""
+    d = os.path.abspath(start or os.path.dirname(__file__))
+    while True:
+        path = os.path.join(d, name)
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(d)
+        if parent == d:
+            return None
+        d = parent
+
+def load_env():
+    """Load the repo's .env once. Deployments that set real env vars skip the dotenv import entirely."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    path = find_env_file()
+    if path:
+        from dotenv import load_dotenv
+        load_dotenv(path)
@@ -1,9 +1,37 @@
 # collectors/google_trends_collector.py
-from pytrends.request import TrendReq
+import threading
 from datetime import datetime
-import pandas as pd
+from collectors.rate_limit import TokenBucket, is_throttled
+from collectors.http_client import HTTP_SECONDS
+from collectors.records import WorkflowRecord
+from serving import metrics
 
-pytrends = TrendReq(hl="en-US", tz=360)
+_pytrends = None
+_pytrends_lock = threading.Lock()
+
+def get_pytrends():
+    """
+    The process-wide TrendReq, built on first use: importing pytrends pulls in
+    pandas, and constructing TrendReq fetches Google cookies over the network.
+    """
+    global _pytrends
+    if _pytrends is None:
+        with _pytrends_lock:
+            if _pytrends is None:
+                from pytrends.request import TrendReq
+                _pytrends = TrendReq(hl="en-US", tz=360)
+    return _pytrends
+
+# every payload carries the anchor, so values from different payloads can be
+# rescaled onto one scale; pytrends accepts at most 5 terms per payload
+ANCHOR_TERM = "n8n"
+MAX_PAYLOAD_TERMS = 5
+MAX_RETRIES = 4
+
+# shared by every Trends request in the process
+TRENDS_LIMITER = TokenBucket(rate=0.2, capacity=2)
+
+RETRIES = metrics.counter("collector_retries_total", "Requests retried after throttling", ("platform",))
 
 def collect_for_keyword(keyword, country="US"):
     """
@@ -11,6 +39,7 @@ def collect_for_keyword(keyword, country="US"):
     """
     try:
         geo = "US" if country == "US" else "IN"
+        pytrends = get_pytrends()
         pytrends.build_payload(
             kw_list=[keyword],
             timeframe="today 3-m",
@@ -25,7 +54,7 @@ def collect_for_keyword(keyword, country="US"):
         older = df[keyword][:7].mean()
         trend_change = int(((recent - older) / max(older, 1)) * 100)
 
-        return {
+        return WorkflowRecord.from_dict({
             "workflow": keyword,
             "platform": "GoogleTrends",
             "popularity_metrics": {
@@ -35,7 +64,91 @@ def collect_for_keyword(keyword, country="US"):
             "country": country,
             "source_url": f"https://trends.google.com/trends/explore?q={keyword}",
             "collected_at": datetime.utcnow().isoformat() + "Z"
-        }
+        })
     except Exception as e:
         print("Trend error:", keyword, country, e)
-        return None
\ No newline at end of file
+        return None
+
+def _interest_over_time(kw_list, geo, limiter):
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            with HTTP_SECONDS.time(platform="trends", endpoint="interest_over_time", outcome="call"):
+                pytrends = get_pytrends()
+                pytrends.build_payload(kw_list=kw_list, timeframe="today 3-m", geo=geo)
+                return pytrends.interest_over_time()
+        except Exception as e:
+            if not is_throttled(e) or attempt == MAX_RETRIES:
+                raise
+            RETRIES.inc(platform="trends")
+            delay = limiter.backoff(attempt)
+            print(f"Trends throttled, backing off {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})")
+
+def records_from_frame(df, keywords, country):
+    """avg_interest / trend_30d_change for every keyword column in one vectorised pass."""
+    values = df[keywords].astype(float)
+    avg = values.mean()
+    recent = values.iloc[-7:].mean()
+    older = values.iloc[:7].mean()
+    change = (recent - older) / older.clip(lower=1) * 100
+    now = datetime.utcnow().isoformat() + "Z"
+    out = []
+    for kw, a, c in zip(keywords, avg.astype(int).tolist(), change.astype(int).tolist()):
+        out.append(WorkflowRecord.from_dict({
+            "workflow": kw,
+            "platform": "GoogleTrends",
+            "popularity_metrics": {
+                "avg_interest": a,
+                "trend_30d_change": c
+            },
+            "country": country,
+            "source_url": f"https://trends.google.com/trends/explore?q={kw}",
+            "collected_at": now
+        }))
+    return out
+
+def collect_batch(keywords, country="US", anchor=ANCHOR_TERM, limiter=TRENDS_LIMITER):
+    """
+    Trends records for many keywords in one country, packed into payloads of
+    the anchor plus 4 keywords. Each payload is rescaled so its anchor mean
+    matches the first payload's, keeping avg_interest comparable across
+    payloads (values can exceed 100 on that shared scale).
+    A payload that fails is reported and skipped as long as another one
+    succeeds; if every payload fails the last error is raised, so callers
+    never record a failed fetch as "no data". Returns [] if Trends answered
+    but has no data for any payload.
+    """
+    geo = "US" if country == "US" else "IN"
+    keywords = list(dict.fromkeys(keywords))
+    others = [kw for kw in keywords if kw != anchor]
+    per_payload = MAX_PAYLOAD_TERMS - 1
+    frames = []
+    ref = None
+    error = None
+    answered = False
+    for i in range(0, max(len(others), 1), per_payload):
+        batch = others[i:i + per_payload]
+        try:
+            df = _interest_over_time(batch + [anchor], geo, limiter)
+        except Exception as e:
+            print("Trend error:", batch, country, e)
+            error = e
+            continue
+        answered = True
+        if df is None or df.empty:
+            continue
+        anchor_mean = float(df[anchor].mean())
+        if ref is None:
+            ref = anchor_mean
+            if anchor in keywords:
+                frames.append(df[[anchor]])
+        scale = ref / anchor_mean if anchor_mean > 0 and ref > 0 else 1.0
+        frames.append(df[batch] * scale)
+    if not answered and error is not None:
+        raise error
+    if not frames:
+        return []
+    import pandas as pd
+    combined = pd.concat(frames, axis=1)
+    present = [kw for kw in keywords if kw in combined.columns]
+    return records_from_frame(combined, present, country)
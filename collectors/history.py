@@ -0,0 +1,169 @@
+# collectors/history.py - append-optimised time-series of popularity metrics per entity
+# usage: python -m collectors.history --import backups/*.json   (seed from old snapshots)
+#        python -m collectors.history --compact
+import argparse, json, os, sqlite3, threading, time
+from collectors.checkpoint import record_key, parse_ts
+from collectors.records import encode
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "history.sqlite3")
+
+DAY = 86400
+RAW_DAYS = 7          # full-resolution points are kept this long, then one per entity per day
+RETENTION_DAYS = 400  # points older than this are dropped
+
+# the metric velocities are computed on, per platform
+PRIMARY_METRIC = {
+    "YouTube": "views",
+    "Discourse": "views",
+    "GoogleTrends": "avg_interest",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,
+    platform TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    region TEXT NOT NULL,
+    UNIQUE (platform, source_id, region)
+);
+CREATE TABLE IF NOT EXISTS points (
+    entity_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    metrics TEXT NOT NULL,
+    PRIMARY KEY (entity_id, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS points_ts ON points (ts);
+"""
+
+def primary_value(rec):
+    metric = PRIMARY_METRIC.get(rec.get("platform"), "views")
+    try:
+        return float((rec.get("popularity_metrics") or {}).get(metric, 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+class HistoryStore:
+    """
+    SQLite points table clustered by (entity, ts), so one entity's range is a
+    contiguous index scan, with a ts index for whole-window scans. Each point
+    holds the primary metric as a column plus the compact metrics dict.
+    """
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._ids = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _entity_id(self, key):
+        eid = self._ids.get(key)
+        if eid is None:
+            self._conn.execute("INSERT OR IGNORE INTO entities (platform, source_id, region) VALUES (?, ?, ?)", key)
+            (eid,) = self._conn.execute("SELECT id FROM entities WHERE platform = ? AND source_id = ? AND region = ?",
+                                        key).fetchone()
+            self._ids[key] = eid
+        return eid
+
+    def append(self, records):
+        """Add one point per record at its collected_at (same entity+second overwrites)."""
+        n = 0
+        with self._lock, self._conn:
+            rows = []
+            for rec in records:
+                ts = int(parse_ts(rec.get("collected_at")) or time.time())
+                metrics = json.dumps(rec.get("popularity_metrics") or {}, separators=(",", ":"), default=encode)
+                rows.append((self._entity_id(record_key(rec)), ts, primary_value(rec), metrics))
+            self._conn.executemany("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?)", rows)
+            n = len(rows)
+        return n
+
+    def range(self, key, start_ts=0, end_ts=None):
+        """[(ts, metrics dict)] for one entity in [start_ts, end_ts], oldest first."""
+        end_ts = end_ts if end_ts is not None else 2 ** 62
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM entities WHERE platform = ? AND source_id = ? AND region = ?",
+                                     key).fetchone()
+            if row is None:
+                return []
+            rows = self._conn.execute("SELECT ts, metrics FROM points WHERE entity_id = ? AND ts BETWEEN ? AND ? "
+                                      "ORDER BY ts", (row[0], start_ts, end_ts)).fetchall()
+        return [(ts, json.loads(m)) for ts, m in rows]
+
+    def compact(self, now=None):
+        """Downsample points older than RAW_DAYS to the last one per day; drop past RETENTION_DAYS."""
+        now = now if now is not None else time.time()
+        with self._lock, self._conn:
+            dropped = self._conn.execute("DELETE FROM points WHERE ts < ?", (int(now - RETENTION_DAYS * DAY),)).rowcount
+            thinned = self._conn.execute(
+                "DELETE FROM points WHERE ts < ? AND EXISTS (SELECT 1 FROM points p2 WHERE p2.entity_id = points.entity_id "
+                "AND p2.ts > points.ts AND p2.ts / ? = points.ts / ?)",
+                (int(now - RAW_DAYS * DAY), DAY, DAY)).rowcount
+        return {"dropped": dropped, "downsampled": thinned}
+
+    def velocities(self, now=None, windows=(7, 30)):
+        """
+        {entity key: {"velocity_7d", "velocity_30d", "acceleration"}} (primary metric
+        per day, e.g. views/day) from a single scan of the longest window. Each rate compares an entity's latest
+        point with its last point at least `window` days older (or its oldest point,
+        if the history is shorter); acceleration is the short minus the long rate.
+        """
+        now = now if now is not None else time.time()
+        start = int(now - (max(windows) + 1) * DAY)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.platform, e.source_id, e.region, p.ts, p.value FROM points p "
+                "JOIN entities e ON e.id = p.entity_id WHERE p.ts >= ? ORDER BY p.entity_id, p.ts", (start,)).fetchall()
+        out = {}
+        series, current = [], None
+
+        def flush():
+            if current is None or len(series) < 2:
+                return
+            last_ts, last_v = series[-1]
+            rates = {}
+            for w in windows:
+                base = series[0]
+                for ts, v in series:
+                    if ts <= last_ts - w * DAY:
+                        base = (ts, v)
+                    else:
+                        break
+                days = (last_ts - base[0]) / DAY
+                rates[w] = (last_v - base[1]) / days if days > 0 else None
+            short, long_ = rates[min(windows)], rates[max(windows)]
+            out[current] = {
+                f"velocity_{min(windows)}d": round(short, 4) if short is not None else None,
+                f"velocity_{max(windows)}d": round(long_, 4) if long_ is not None else None,
+                "acceleration": round(short - long_, 4) if short is not None and long_ is not None else None,
+            }
+
+        for platform, source_id, region, ts, value in rows:
+            key = (platform, source_id, region)
+            if key != current:
+                flush()
+                series, current = [], key
+            series.append((ts, value))
+        flush()
+        return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the popularity history store")
+    parser.add_argument("--path", default=HISTORY_PATH)
+    parser.add_argument("--import", dest="imports", nargs="*", default=[], help="JSON record files to append")
+    parser.add_argument("--compact", action="store_true")
+    args = parser.parse_args()
+    store = HistoryStore(args.path)
+    for path in args.imports:
+        with open(path, "r", encoding="utf-8") as f:
+            print(f"IMPORTED {store.append(json.load(f))} points from {path}")
+    if args.compact:
+        print("COMPACTED", store.compact())
+    store.close()
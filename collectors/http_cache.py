@@ -0,0 +1,157 @@
+# collectors/http_cache.py - on-disk HTTP response cache with conditional revalidation
+import hashlib, json, os, re, sqlite3, threading, time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+from serving import metrics
+
+# headers kept with a cached body
+KEPT_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires", "date")
+# query parameters that never become part of a cache key or stored URL
+SECRET_PARAMS = ("key",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL
+);
+"""
+
+CACHE_EVENTS = metrics.counter("collector_http_cache_total", "HTTP cache lookups by outcome", ("outcome",))
+
+_MAX_AGE = re.compile(r"(?:s-maxage|max-age)\s*=\s*(\d+)")
+
+def freshness_lifetime(headers):
+    """Seconds a response may be reused without revalidation; None if it must not be stored."""
+    cc = (headers.get("cache-control") or "").lower()
+    if "no-store" in cc:
+        return None
+    if "no-cache" in cc:
+        return 0
+    m = _MAX_AGE.search(cc)
+    if m:
+        return int(m.group(1))
+    if headers.get("expires"):
+        try:
+            return max(0, parsedate_to_datetime(headers["expires"]).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+def _build_response(url, status, headers, body, outcome):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    r = requests.Response()
+    r.cache_outcome = outcome
+    r.status_code = status
+    r.headers = CaseInsensitiveDict(headers)
+    r._content = body
+    r.url = url
+    r.reason = "OK"
+    r.encoding = "utf-8"
+    return r
+
+class HttpCache:
+    """
+    Responses to GET requests, keyed by URL + sorted params (API keys excluded)
+    + request headers that vary the payload. Fresh entries are served from disk;
+    stale ones are revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged payload costs a 304. ttl_overrides maps URL prefixes to a lifetime
+    in seconds that replaces whatever the server's cache headers say.
+    """
+    def __init__(self, path, ttl_overrides=None):
+        self.path = path
+        self.ttl_overrides = dict(ttl_overrides or {})
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "stored": 0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _count(self, name):
+        CACHE_EVENTS.inc(outcome=name)
+        with self._lock:
+            self.stats[name] += 1
+
+    def _lifetime(self, url, headers):
+        for prefix, ttl in self.ttl_overrides.items():
+            if url.startswith(prefix):
+                return ttl
+        return freshness_lifetime(headers)
+
+    @staticmethod
+    def cache_key(url, params=None, headers=None):
+        public = sorted((k, str(v)) for k, v in (params or {}).items() if k not in SECRET_PARAMS)
+        vary = sorted((k.lower(), v) for k, v in (headers or {}).items() if k.lower() == "api-username")
+        raw = json.dumps([url, public, vary], separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest(), url + ("?" + urlencode(public) if public else "")
+
+    def _load(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT url, expires_at, headers, body FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+        if row is None:
+            return None
+        url, expires_at, headers, body = row
+        return url, expires_at, json.loads(headers), body
+
+    def _store(self, key, url, headers, body, lifetime):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, url, now, now + lifetime, json.dumps(headers), body))
+            self.stats["stored"] += 1
+        CACHE_EVENTS.inc(outcome="stored")
+
+    def _drop(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def get(self, session, url, params=None, headers=None, timeout=15):
+        key, public_url = self.cache_key(url, params, headers)
+        cached = self._load(key)
+        if cached is not None and cached[1] > time.time():
+            self._count("fresh_hits")
+            return _build_response(public_url, 200, cached[2], cached[3], "fresh")
+
+        req_headers = dict(headers or {})
+        if cached is not None:
+            if cached[2].get("etag"):
+                req_headers["If-None-Match"] = cached[2]["etag"]
+            if cached[2].get("last-modified"):
+                req_headers["If-Modified-Since"] = cached[2]["last-modified"]
+        r = session.get(url, params=params, headers=req_headers, timeout=timeout)
+
+        if r.status_code == 304 and cached is not None:
+            self._count("revalidated")
+            merged = dict(cached[2])
+            merged.update({k: v for k, v in ((h, r.headers.get(h)) for h in KEPT_HEADERS) if v})
+            lifetime = self._lifetime(url, merged)
+            if lifetime is None:   # now no-store: the body may be used once but not kept
+                self._drop(key)
+            else:
+                self._store(key, public_url, merged, cached[3], lifetime)
+            return _build_response(public_url, 200, merged, cached[3], "revalidated")
+
+        self._count("misses")
+        if r.status_code == 200:
+            kept = {h: r.headers[h] for h in KEPT_HEADERS if r.headers.get(h)}
+            lifetime = self._lifetime(url, kept)
+            if lifetime is not None:
+                self._store(key, public_url, kept, r.content, lifetime)
+        return r
+
+    def purge_expired(self, older_than=7 * 86400):
+        """Drop entries that expired more than older_than seconds ago."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM responses WHERE expires_at < ?",
+                                      (time.time() - older_than,)).rowcount
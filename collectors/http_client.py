@@ -0,0 +1,60 @@
+# collectors/http_client.py - shared pooled HTTP session for all collectors
+import threading, time
+from serving import metrics
+
+DEFAULT_TIMEOUT = 15
+POOL_MAXSIZE = 32
+
+_session = None
+_cache = None
+_lock = threading.Lock()
+
+HTTP_SECONDS = metrics.histogram("collector_http_request_seconds",
+                                 "Collector HTTP GET latency (outcome: status code, fresh/revalidated cache, or error)",
+                                 ("platform", "endpoint", "outcome"))
+
+def get_session():
+    """
+    Process-wide requests.Session with a connection pool large enough for
+    the concurrent pipeline, so keep-alive connections are reused per host.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                # imported here: requests/urllib3 cost ~100ms, paid only once something is fetched
+                import requests
+                from requests.adapters import HTTPAdapter
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+def enable_cache(path, ttl_overrides=None):
+    """Route every collector GET through an on-disk HttpCache (see http_cache.py)."""
+    global _cache
+    from collectors.http_cache import HttpCache
+    _cache = HttpCache(path, ttl_overrides)
+    return _cache
+
+def disable_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+def get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, platform="", endpoint=""):
+    """GET through the pooled session (and the cache when enabled), timed per platform/endpoint."""
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        if _cache is not None:
+            r = _cache.get(get_session(), url, params=params, headers=headers, timeout=timeout)
+        else:
+            r = get_session().get(url, params=params, headers=headers, timeout=timeout)
+        outcome = getattr(r, "cache_outcome", None) or str(r.status_code)
+        return r
+    finally:
+        HTTP_SECONDS.observe(time.perf_counter() - t0, platform=platform, endpoint=endpoint, outcome=outcome)
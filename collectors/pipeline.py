@@ -0,0 +1,220 @@
+# collectors/pipeline.py - concurrent fan-out over keywords, regions and platforms
+import hashlib, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from collectors import youtube_collector, discourse_collector, google_trends_collector
+from serving import metrics
+
+REGIONS = ("US", "IN")
+PLATFORM_ORDER = ("youtube", "discourse", "trends")   # also the output order of records
+
+# per-platform worker limits; pytrends shares one TrendReq session so stays serial
+DEFAULT_CONCURRENCY = {
+    "youtube": 8,
+    "discourse": 4,
+    "trends": 1,
+}
+
+RECORDS = metrics.counter("collector_records_total", "Records collected", ("platform",))
+RECORDS_PER_SECOND = metrics.gauge("collector_records_per_second",
+                                   "Records per second of the last run, up to the platform's last result", ("platform",))
+UNIT_ERRORS = metrics.counter("collector_unit_errors_total", "Units of work that raised", ("platform",))
+
+def record_throughput(platform, count, seconds):
+    RECORDS.inc(count, platform=platform)
+    RECORDS_PER_SECOND.set(round(count / seconds, 3) if seconds > 0 else 0.0, platform=platform)
+
+def _stamp(items):
+    out = []
+    for it in items or []:
+        if not it.get("collected_at"):
+            it["collected_at"] = datetime.utcnow().isoformat() + "Z"
+        out.append(it)
+    return out
+
+class CollectionPipeline:
+    """
+    Runs every (platform, keyword, region) unit of work on a bounded
+    per-platform thread pool. All pools run at the same time, so a run takes
+    about as long as the slowest platform instead of the sum of all of them.
+    Discourse topic detail fetches are fanned out as soon as their search returns.
+    Records come back in the same order the sequential run_* functions produce.
+    With youtube_batched=True, YouTube statistics are fetched for the whole run in
+    packed 50-id calls (see youtube_collector.collect_batched); the call and quota
+    savings land in self.stats["youtube"].
+    With a checkpoint (collectors.checkpoint.CheckpointStore), records are written
+    as they arrive, and units and entities collected within its TTL are reused.
+    Trends keywords are packed into anchor-calibrated payloads per country unless
+    trends_batched=False (see google_trends_collector.collect_batch).
+    """
+    def __init__(self, keywords, concurrency=None, youtube_per_keyword=2,
+                 forum_per_keyword=3, platforms=("youtube", "discourse", "trends"),
+                 youtube_batched=False, checkpoint=None, trends_batched=True):
+        self.keywords = list(keywords)
+        self.concurrency = dict(DEFAULT_CONCURRENCY, **(concurrency or {}))
+        self.youtube_per_keyword = youtube_per_keyword
+        self.forum_per_keyword = forum_per_keyword
+        self.platforms = tuple(platforms)
+        self.youtube_batched = youtube_batched
+        self.checkpoint = checkpoint
+        self.trends_batched = trends_batched
+        self.stats = {}
+
+    def _youtube_units(self):
+        for kw in self.keywords:
+            for region in REGIONS:
+                yield (f"youtube|{kw}|{region}|{self.youtube_per_keyword}",
+                       f"YT Error collecting for {kw} {region}",
+                       lambda kw=kw, region=region: youtube_collector.collect_for_keyword(
+                           kw, regionCode=region, maxResults=self.youtube_per_keyword))
+
+    def _trends_units(self):
+        if self.trends_batched:
+            # one unit per country: anchor-calibrated 5-term payloads behind a shared rate limiter
+            terms = [f"n8n {kw}" for kw in self.keywords]
+            digest = hashlib.blake2b("\n".join(terms).encode("utf-8"), digest_size=8).hexdigest()
+            for country in REGIONS:
+                yield (f"trends|batch|{country}|{digest}",
+                       f"Trend error (batched) {country}",
+                       lambda country=country: google_trends_collector.collect_batch(terms, country))
+            return
+        for kw in self.keywords:
+            for country in REGIONS:
+                yield (f"trends|{kw}|{country}",
+                       f"Trend error {kw} {country}",
+                       lambda kw=kw, country=country: [google_trends_collector.collect_for_keyword(f"n8n {kw}", country)])
+
+    def run(self):
+        fresh = self.checkpoint.fresh_records() if self.checkpoint else {}
+        fresh_units = self.checkpoint.fresh_units() if self.checkpoint else {}
+        reused = {"units": 0, "entities": 0}
+
+        def resume(unit):
+            keys = fresh_units.get(unit)
+            if keys is None or any(k not in fresh for k in keys):
+                return None
+            reused["units"] += 1
+            return [fresh[k] for k in keys]
+
+        pools = {p: ThreadPoolExecutor(max_workers=max(1, self.concurrency[p]), thread_name_prefix=p)
+                 for p in self.platforms}
+        # slot -> list of records; slots are ordered (platform rank, keyword index, sub index)
+        slots = {}
+        pending = {}
+        # unit -> [outstanding leaf count, records]; completed units are checkpointed
+        open_units = {}
+
+        def finish_leaf(slot, unit, records):
+            slots[slot] = records
+            if self.checkpoint is None:
+                return
+            self.checkpoint.put_many(records)
+            if unit is None:
+                return
+            state = open_units.setdefault(unit, [1, []])
+            state[0] -= 1
+            state[1].extend(records)
+            if state[0] <= 0:
+                if state[1]:   # a unit whose fetches all came back empty is retried next run
+                    self.checkpoint.complete_unit(unit, state[1])
+                del open_units[unit]
+
+        started = time.perf_counter()
+        # platform -> [records, seconds until its latest result]
+        throughput = {p: [0, 0.0] for p in self.platforms}
+        try:
+            rank = {p: i for i, p in enumerate(PLATFORM_ORDER)}
+            if "youtube" in pools and self.youtube_batched:
+                # the coordinator runs off-pool so it can block on searches/batches in the youtube pool
+                pools["youtube-batch"] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="youtube-batch")
+                self.stats["youtube"] = {}
+                cached = {(sid, region): rec for (platform, sid, region), rec in fresh.items() if platform == "YouTube"}
+                fut = pools["youtube-batch"].submit(youtube_collector.collect_batched, self.keywords, REGIONS,
+                                                    self.youtube_per_keyword, pools["youtube"], self.stats["youtube"],
+                                                    cached)
+                pending[fut] = ((rank["youtube"], 0, 0), "YT Error in batched collection", "leaf", None)
+            elif "youtube" in pools:
+                for i, (unit, label, fn) in enumerate(self._youtube_units()):
+                    prior = resume(unit)
+                    if prior is not None:
+                        slots[(rank["youtube"], i, 0)] = prior
+                        continue
+                    pending[pools["youtube"].submit(fn)] = ((rank["youtube"], i, 0), label, "leaf", unit)
+            if "trends" in pools:
+                for i, (unit, label, fn) in enumerate(self._trends_units()):
+                    prior = resume(unit)
+                    if prior is not None:
+                        slots[(rank["trends"], i, 0)] = prior
+                        continue
+                    pending[pools["trends"].submit(fn)] = ((rank["trends"], i, 0), label, "leaf", unit)
+            if "discourse" in pools:
+                for i, kw in enumerate(self.keywords):
+                    unit = f"discourse|{kw}|{self.forum_per_keyword}"
+                    prior = resume(unit)
+                    if prior is not None:
+                        slots[(rank["discourse"], i, 0)] = prior
+                        continue
+                    fut = pools["discourse"].submit(discourse_collector.search_topics, kw, limit=self.forum_per_keyword)
+                    pending[fut] = ((rank["discourse"], i, 0), f"Forum Error collecting for {kw}", "search", unit)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    slot, label, kind, unit = pending.pop(fut)
+                    platform = PLATFORM_ORDER[slot[0]]
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        UNIT_ERRORS.inc(platform=platform)
+                        print(f"{label}: {e}")
+                        continue
+                    if kind == "search":
+                        topics = result or []
+                        open_units[unit] = [len(topics), []]
+                        if not topics and self.checkpoint is not None:
+                            self.checkpoint.complete_unit(unit, [])
+                            del open_units[unit]
+                        # fan topic details out on the same discourse pool
+                        for j, t in enumerate(topics):
+                            prior = fresh.get(("Discourse", str(t.get("topic_id")), ""))
+                            if prior is not None:
+                                reused["entities"] += 1
+                                finish_leaf(slot[:2] + (j,), unit, [prior])
+                                continue
+                            sub = pools["discourse"].submit(discourse_collector.fetch_topic_details, t.get("topic_id"))
+                            pending[sub] = (slot[:2] + (j,), label, "leaf", unit)
+                    else:
+                        records = _stamp([r for r in (result if isinstance(result, list) else [result]) if r])
+                        throughput[platform][0] += len(records)
+                        throughput[platform][1] = time.perf_counter() - started
+                        finish_leaf(slot, unit, records)
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        self.stats["checkpoint"] = reused
+        self.stats["throughput"] = throughput
+        for platform, (count, seconds) in throughput.items():
+            record_throughput(platform, count, seconds)
+        records = []
+        for slot in sorted(slots):
+            records.extend(slots[slot])
+        return records
+
+def run_concurrent(keywords, youtube_per_keyword=2, forum_per_keyword=3, concurrency=None,
+                   youtube_batched=False, checkpoint=None, trends_batched=True):
+    pipeline = CollectionPipeline(keywords, concurrency=concurrency,
+                                  youtube_per_keyword=youtube_per_keyword,
+                                  forum_per_keyword=forum_per_keyword,
+                                  youtube_batched=youtube_batched,
+                                  checkpoint=checkpoint,
+                                  trends_batched=trends_batched)
+    records = pipeline.run()
+    cp = pipeline.stats.get("checkpoint")
+    if checkpoint is not None and cp:
+        print(f"Checkpoint: reused {cp['units']} units and {cp['entities']} entities")
+    yt = pipeline.stats.get("youtube")
+    if yt:
+        print(f"YT batched stats: {yt['videos_calls']} videos calls for {yt['unique_video_ids']} unique ids "
+              f"(saved {yt['http_calls_saved']} calls, {yt['quota_units_saved']} quota units)")
+    return records
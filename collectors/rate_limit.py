@@ -0,0 +1,48 @@
+# collectors/rate_limit.py - shared token-bucket rate limiter with backoff
+import random, threading, time
+
+class TokenBucket:
+    """
+    rate tokens per second, bursts up to capacity. acquire() blocks until a
+    token is available. backoff() is shared by every caller of the bucket: after
+    a throttling response nobody sends again until the pause is over.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return
+                    wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, attempt, base=2.0, cap=120.0):
+        """Pause all callers for an exponential, jittered delay; returns the delay."""
+        delay = min(cap, base * (2 ** attempt)) * (0.5 + random.random() / 2)
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._tokens = 0.0
+        return delay
+
+def is_throttled(exc):
+    """True for HTTP 429 responses (requests and pytrends errors alike)."""
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return type(exc).__name__ == "TooManyRequestsError" or "429" in str(exc)
@@ -0,0 +1,194 @@
+# collectors/records.py - compact workflow record model shared by collectors, scorer and API
+#
+# A record is two slots: a Layout (the JSON object's keys in order, interned and
+# shared by every record with the same keys) and a list of values. Metrics get
+# one layout per platform shape the same way, so the key strings and hash tables
+# a dict would repeat per record exist once per layout.
+# Low-cardinality string values (INTERNED_FIELDS) are interned on load, so
+# "YouTube" or "US" is one object instead of one per parsed record.
+# Records keep the dict surface the pipeline already uses (get, [], setdefault,
+# in, copy, keys/items) and round-trip the existing JSON schema byte for byte.
+import gc
+from contextlib import contextmanager
+from sys import intern
+
+INTERNED_FIELDS = ("platform", "country")
+# layouts interned process-wide; record shapes are few and fixed (one per collector
+# and scorer stage), so past this many distinct key sets new ones are not shared
+MAX_LAYOUTS = 1024
+
+class Layout:
+    """Ordered keys of one record shape plus key -> position; one instance per distinct key tuple."""
+    __slots__ = ("keys", "index", "interned", "_grown")
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = {k: i for i, k in enumerate(keys)}
+        self.interned = tuple(self.index[k] for k in INTERNED_FIELDS if k in self.index)
+        self._grown = {}
+
+    def plus(self, key):
+        nxt = self._grown.get(key)
+        if nxt is None:
+            nxt = self._grown[key] = layout_for(self.keys + (key,))
+        return nxt
+
+_LAYOUTS = {}
+
+def layout_for(keys):
+    layout = _LAYOUTS.get(keys)
+    if layout is None:
+        layout = Layout(keys)
+        if len(_LAYOUTS) < MAX_LAYOUTS:
+            _LAYOUTS[keys] = layout
+    return layout
+
+class _Row:
+    __slots__ = ("_layout", "_vals")
+
+    def __init__(self, keys=(), values=()):
+        self._layout = layout_for(tuple(keys))
+        self._vals = list(values)
+
+    @classmethod
+    def _make(cls, layout, vals):
+        row = cls.__new__(cls)
+        row._layout = layout
+        row._vals = vals
+        return row
+
+    def get(self, key, default=None):
+        i = self._layout.index.get(key)
+        return default if i is None else self._vals[i]
+
+    def __getitem__(self, key):
+        i = self._layout.index.get(key)
+        if i is None:
+            raise KeyError(key)
+        return self._vals[i]
+
+    def __setitem__(self, key, value):
+        i = self._layout.index.get(key)
+        if i is None:
+            self._layout = self._layout.plus(key)
+            self._vals.append(value)
+        else:
+            self._vals[i] = value
+
+    def setdefault(self, key, default=None):
+        i = self._layout.index.get(key)
+        if i is None:
+            self[key] = default
+            return default
+        return self._vals[i]
+
+    def update(self, other=(), **kwargs):
+        for key, value in (other.items() if hasattr(other, "items") else other):
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def __contains__(self, key):
+        return key in self._layout.index
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._vals)
+
+    def keys(self):
+        return self._layout.keys
+
+    def values(self):
+        return list(self._vals)
+
+    def items(self):
+        return list(zip(self._layout.keys, self._vals))
+
+    def copy(self):
+        """Shallow copy, like dict(rec): nested metrics stay shared."""
+        return self._make(self._layout, self._vals[:])
+
+    def to_dict(self):
+        """Plain nested dicts in the original key order (the JSON schema)."""
+        d = dict(zip(self._layout.keys, self._vals))
+        for k, v in d.items():
+            if isinstance(v, _Row):
+                d[k] = v.to_dict()
+        return d
+
+    def __eq__(self, other):
+        if isinstance(other, _Row):
+            other = other.to_dict()
+        return self.to_dict() == other if isinstance(other, dict) else NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class Metrics(_Row):
+    """popularity_metrics of one record."""
+    __slots__ = ()
+
+class WorkflowRecord(_Row):
+    """One collected or scored workflow, keys in the order they were collected/added."""
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, d, _new=object.__new__):
+        # hot path (every loaded record): C-level copies plus the interned and metrics slots
+        keys = tuple(d)
+        layout = _LAYOUTS.get(keys) or layout_for(keys)
+        rec = _new(cls)
+        rec._layout = layout
+        rec._vals = vals = list(d.values())
+        for i in layout.interned:
+            if vals[i].__class__ is str:
+                vals[i] = intern(vals[i])
+        i = layout.index.get("popularity_metrics")
+        if i is not None and vals[i].__class__ is dict:
+            pm = vals[i]
+            keys = tuple(pm)
+            vals[i] = m = _new(Metrics)
+            m._layout = _LAYOUTS.get(keys) or layout_for(keys)
+            m._vals = list(pm.values())
+        return rec
+
+def as_record(rec):
+    """WorkflowRecord for a dict (converted) or a record (returned as is)."""
+    return rec if rec.__class__ is WorkflowRecord else WorkflowRecord.from_dict(rec)
+
+def to_plain(obj):
+    """
+    A record as nested dicts (anything else unchanged). Bulk writers convert
+    before encoding: json calls a default= hook through its pure-Python path,
+    which doubles the cost of an indented dump.
+    """
+    return obj.to_dict() if isinstance(obj, _Row) else obj
+
+@contextmanager
+def paused_gc():
+    """
+    Suspend the cyclic GC while building many records. Records and their value
+    lists are GC-tracked (plain dicts of scalars are not), so bulk loads would
+    otherwise trigger repeated full collections; records hold no cycles.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def encode(obj):
+    """json default= hook: records and metrics serialise as the objects they replace."""
+    if isinstance(obj, _Row):
+        return dict(zip(obj._layout.keys, obj._vals))
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def record_hook(obj, _from_dict=WorkflowRecord.from_dict):
+    """json object_hook: workflow objects (those with a platform) load as WorkflowRecords."""
+    return _from_dict(obj) if "platform" in obj else obj
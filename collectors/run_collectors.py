@@ -1,9 +1,17 @@
 # collectors/run_collectors.py
-import os, json
+import os, json, argparse, time
 from datetime import datetime
 from collectors.youtube_collector import collect_for_keyword as yt_collect
 from collectors.discourse_collector import collect_for_keyword as forum_collect
 from collectors.google_trends_collector import collect_for_keyword as trends_collect
+from collectors.pipeline import run_concurrent, record_throughput
+from collectors.checkpoint import CheckpointStore
+from collectors.scheduler import CollectionScheduler, SCHEDULE_PATH, default_budgets, known_entities, run_scheduled
+from collectors.history import HistoryStore, HISTORY_PATH
+from collectors.records import encode
+from collectors import http_client, youtube_collector, discourse_collector
+from serving import metrics
+from serving.profiler import profile_to
 
 SEED_KEYWORDS = [
     "gmail automation", "google sheets", "slack integration",
@@ -12,6 +20,17 @@ SEED_KEYWORDS = [
 ]
 
 OUTPUT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sample_workflows.json")
+CHECKPOINT_PATH = os.path.join(os.path.dirname(OUTPUT_PATH), "collect_checkpoint.sqlite3")
+HTTP_CACHE_PATH = os.path.join(os.path.dirname(OUTPUT_PATH), "http_cache.sqlite3")
+
+# seconds a cached response is reused before revalidation, by URL prefix; these
+# APIs mark responses private/no-cache, so without an override every call revalidates
+HTTP_TTL_OVERRIDES = {
+    youtube_collector.SEARCH_URL: 6 * 3600,      # 100 quota units per call, results drift slowly
+    youtube_collector.VIDEOS_URL: 30 * 60,       # view counts move; keep them fresh-ish
+    discourse_collector.SEARCH_URL: 30 * 60,
+    discourse_collector.DISCOURSE_BASE.rstrip("/") + "/t/": 15 * 60,
+}
 
 def run_youtube_collect(max_per_keyword=2):
     records = []
@@ -52,12 +71,130 @@ def run_trends_collect():
 def save_records(records):
     os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
     with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(records, f, indent=2, ensure_ascii=False)
+        json.dump(records, f, indent=2, ensure_ascii=False, default=encode)
     print(f"WROTE {len(records)} records to {OUTPUT_PATH}")
 
-if __name__ == "__main__":
+def run_scheduled_collect(schedule_path, checkpoint_path, budgets, history_path=None, concurrency=None):
+    """
+    One budgeted pass of the persistent task queue (collectors/scheduler.py).
+    Refreshed records are merged into the checkpoint, which holds the latest
+    record of every known entity; returns (that full snapshot, the fresh records).
+    """
+    velocities = {}
+    if history_path and os.path.exists(history_path):
+        history = HistoryStore(history_path)
+        velocities = history.velocities()
+        history.close()
+    checkpoint = CheckpointStore(checkpoint_path)
+    scheduler = CollectionScheduler(schedule_path)
+    try:
+        scheduler.sync(SEED_KEYWORDS, known_entities(checkpoint), velocities)
+        fresh, stats = run_scheduled(scheduler, budgets, concurrency)
+        checkpoint.put_many(fresh)
+        recs = checkpoint.all_records()
+    finally:
+        scheduler.close()
+        checkpoint.close()
+    spent = ", ".join(f"{p} {stats['spent'][p]:g}/{budgets[p]:g}" for p in budgets)
+    print(f"Scheduled: {stats['tasks']} tasks, {len(fresh)} fresh records, budget spent: {spent}")
+    return recs, fresh
+
+def run_sequential():
     recs = []
-    recs.extend(run_youtube_collect(max_per_keyword=2))
-    recs.extend(run_forum_collect(max_per_keyword=3))
-    recs.extend(run_trends_collect())
-    save_records(recs)
\ No newline at end of file
+    for platform, collect in (("youtube", lambda: run_youtube_collect(max_per_keyword=2)),
+                              ("discourse", lambda: run_forum_collect(max_per_keyword=3)),
+                              ("trends", run_trends_collect)):
+        t0 = time.perf_counter()
+        got = collect()
+        record_throughput(platform, len(got), time.perf_counter() - t0)
+        recs.extend(got)
+    return recs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect workflow popularity records")
+    parser.add_argument("--sequential", action="store_true", help="run platforms and keywords one after another")
+    parser.add_argument("--youtube-batched", action="store_true", help="dedupe video ids and fetch stats in 50-id batches")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="SQLite checkpoint file (records are written as they arrive)")
+    parser.add_argument("--no-checkpoint", action="store_true")
+    parser.add_argument("--ttl-minutes", type=float, default=None,
+                        help="reuse units/entities collected within this window (default 60); 0 refetches everything")
+    parser.add_argument("--history", default=HISTORY_PATH, help="time-series store the run's metrics are appended to")
+    parser.add_argument("--no-history", action="store_true")
+    parser.add_argument("--http-cache", default=HTTP_CACHE_PATH, help="on-disk HTTP response cache")
+    parser.add_argument("--no-http-cache", action="store_true")
+    parser.add_argument("--http-ttl", action="append", default=[], metavar="PREFIX=SECONDS",
+                        help="override the cache lifetime for URLs starting with PREFIX (repeatable)")
+    parser.add_argument("--profile", default=None, metavar="PATH",
+                        help="sample the run's stacks and write folded stacks (flamegraph input) to PATH")
+    parser.add_argument("--scheduled", action="store_true",
+                        help="spend a per-run API budget on the highest-priority searches/refreshes instead of a fixed pass")
+    parser.add_argument("--schedule", default=SCHEDULE_PATH, help="task queue for --scheduled")
+    parser.add_argument("--budget", action="append", default=[], metavar="PLATFORM=UNITS",
+                        help="--scheduled budget: youtube quota units, discourse calls, trends payloads "
+                             "(default: what a fixed run costs; repeatable)")
+    parser.add_argument("--youtube-workers", type=int, default=None)
+    parser.add_argument("--discourse-workers", type=int, default=None)
+    args = parser.parse_args()
+    if args.scheduled and (args.no_checkpoint or args.sequential):
+        parser.error("--scheduled keeps the collected snapshot in the checkpoint; drop --no-checkpoint/--sequential")
+    if args.scheduled and (args.youtube_batched or args.ttl_minutes is not None):
+        parser.error("--scheduled always packs YouTube stats calls and picks tasks by priority and age; "
+                     "drop --youtube-batched/--ttl-minutes")
+    ttl_minutes = 60.0 if args.ttl_minutes is None else args.ttl_minutes
+
+    if not args.no_http_cache:
+        ttls = dict(HTTP_TTL_OVERRIDES)
+        for spec in args.http_ttl:
+            prefix, sep, seconds = spec.rpartition("=")
+            if not sep or not prefix:
+                parser.error(f"--http-ttl {spec!r}: expected PREFIX=SECONDS")
+            try:
+                seconds = float(seconds)
+            except ValueError:
+                seconds = None
+            if seconds is None or not seconds >= 0:   # also rejects nan
+                parser.error(f"--http-ttl {spec!r}: SECONDS must be a non-negative number")
+            ttls[prefix] = seconds
+        http_cache = http_client.enable_cache(args.http_cache, ttls)
+
+    concurrency = {}
+    if args.youtube_workers:
+        concurrency["youtube"] = args.youtube_workers
+    if args.discourse_workers:
+        concurrency["discourse"] = args.discourse_workers
+    with profile_to(args.profile):
+        if args.sequential:
+            recs = fresh = run_sequential()
+        elif args.scheduled:
+            budgets = default_budgets(SEED_KEYWORDS)
+            for spec in args.budget:
+                platform, sep, units = spec.partition("=")
+                if not sep or platform not in budgets:
+                    parser.error(f"--budget {spec!r}: expected PLATFORM=UNITS with PLATFORM one of {', '.join(budgets)}")
+                try:
+                    units = float(units)
+                except ValueError:
+                    units = None
+                if units is None or not units >= 0:   # also rejects nan
+                    parser.error(f"--budget {spec!r}: UNITS must be a non-negative number")
+                budgets[platform] = units
+            recs, fresh = run_scheduled_collect(args.schedule, args.checkpoint, budgets,
+                                                None if args.no_history else args.history, concurrency)
+        else:
+            checkpoint = None if args.no_checkpoint else CheckpointStore(args.checkpoint, ttl_seconds=ttl_minutes * 60)
+            try:
+                recs = fresh = run_concurrent(SEED_KEYWORDS, youtube_per_keyword=2, forum_per_keyword=3,
+                                              concurrency=concurrency, youtube_batched=args.youtube_batched,
+                                              checkpoint=checkpoint)
+            finally:
+                if checkpoint is not None:
+                    checkpoint.close()
+    save_records(recs)
+    if not args.no_http_cache:
+        print(f"HTTP cache: {http_cache.stats}, purged {http_cache.purge_expired()} expired entries")
+        http_client.disable_cache()
+    if not args.no_history:
+        history = HistoryStore(args.history)
+        print(f"HISTORY +{history.append(fresh)} points, {history.compact()}")
+        history.close()
+    print(f"METRICS written to {metrics.write_textfile('collectors')}")
\ No newline at end of file
@@ -0,0 +1,295 @@
+# collectors/scheduler.py - budgeted, priority-ordered collection driven by a persistent task queue
+# usage: python -m collectors.run_collectors --scheduled [--budget youtube=1000 ...]
+#        python -m collectors.scheduler --show 20        (inspect the queue)
+#
+# Every unit of work is a task in a SQLite queue that survives between runs:
+#   search|youtube|<keyword>|<region>    search + stats call, discovers videos
+#   search|discourse|<keyword>           search + one detail call per topic
+#   refresh|<platform>|<source id>|<region>  re-fetch one known entity
+# A task's priority is its staleness (hours since it last ran) times
+# 1 + hotness, where hotness is the log-scaled 7-day velocity plus acceleration
+# of the entity's primary metric (collectors/history.py); a search is as hot as
+# the hottest entity it found last time. Each run spends a per-platform budget
+# on the tasks with the highest priority per unit of cost.
+import argparse, heapq, json, math, os, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from collectors import youtube_collector, discourse_collector, google_trends_collector
+from collectors.checkpoint import record_key, parse_ts
+from collectors.pipeline import REGIONS, DEFAULT_CONCURRENCY, PLATFORM_ORDER, _stamp, record_throughput
+from serving import metrics
+
+SCHEDULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "collect_schedule.sqlite3")
+
+# platform -> platform name in records/entity keys
+PLATFORM_NAMES = {"youtube": "YouTube", "discourse": "Discourse", "trends": "GoogleTrends"}
+PLATFORMS = {name: platform for platform, name in PLATFORM_NAMES.items()}
+
+# budget units: YouTube Data API quota units, Discourse HTTP calls, Trends payloads
+TRENDS_TERMS_PER_PAYLOAD = google_trends_collector.MAX_PAYLOAD_TERMS - 1
+MIN_AGE_SECONDS = 15 * 60   # tasks that ran more recently than this are never picked
+
+BUDGET_SPENT = metrics.gauge("collector_budget_spent", "API cost spent by the last scheduled run, in budget units",
+                             ("platform",))
+TASKS_RUN = metrics.counter("collector_scheduled_tasks_total", "Scheduled tasks run", ("platform", "kind"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    args TEXT NOT NULL,
+    last_run_ts REAL NOT NULL DEFAULT 0,
+    hotness REAL NOT NULL DEFAULT 0,
+    priority REAL NOT NULL DEFAULT 0,
+    found TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority DESC);
+"""
+
+def search_cost(platform, forum_per_keyword=3):
+    if platform == "youtube":
+        return youtube_collector.SEARCH_QUOTA_UNITS + youtube_collector.VIDEOS_QUOTA_UNITS
+    return 1 + forum_per_keyword
+
+def refresh_cost(platform):
+    """Amortised cost of one entity refresh (YouTube stats and Trends terms are fetched in packed calls)."""
+    if platform == "youtube":
+        return youtube_collector.VIDEOS_QUOTA_UNITS / youtube_collector.STATS_BATCH_SIZE
+    if platform == "trends":
+        return 1.0 / TRENDS_TERMS_PER_PAYLOAD
+    return 1.0
+
+def default_budgets(keywords, forum_per_keyword=3):
+    """What a fixed run_concurrent pass over keywords costs, so scheduling never raises API spend."""
+    n = len(keywords)
+    return {
+        "youtube": n * len(REGIONS) * search_cost("youtube"),
+        "discourse": n * search_cost("discourse", forum_per_keyword),
+        "trends": len(REGIONS) * math.ceil(n / TRENDS_TERMS_PER_PAYLOAD),
+    }
+
+def hotness(velocity):
+    """Log-scaled growth of the primary metric; 0 for flat, shrinking or unknown entities."""
+    if not velocity:
+        return 0.0
+    v = velocity.get("velocity_7d") or 0.0
+    a = velocity.get("acceleration") or 0.0
+    return math.log10(1.0 + max(v, 0.0)) + math.log10(1.0 + max(a, 0.0))
+
+def priority(last_run_ts, hot, now):
+    return max(now - last_run_ts, 0.0) / 3600.0 * (1.0 + hot)
+
+def entity_task(key):
+    platform, source_id, region = key
+    return f"refresh|{PLATFORMS[platform]}|{source_id}|{region}"
+
+class CollectionScheduler:
+    """
+    Persistent priority queue of collection tasks. sync() adds tasks for the
+    seed keywords and every known entity and re-prioritises them, plan() picks
+    what fits the budgets, complete() records what ran.
+    """
+    def __init__(self, path=SCHEDULE_PATH, youtube_per_keyword=2, forum_per_keyword=3, min_age=MIN_AGE_SECONDS):
+        self.path = path
+        self.youtube_per_keyword = youtube_per_keyword
+        self.forum_per_keyword = forum_per_keyword
+        self.min_age = min_age
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def sync(self, keywords, entities=(), velocities=None, now=None):
+        """
+        Add search tasks for keywords (Trends keywords are refresh tasks of their
+        "n8n <keyword>" entity) and refresh tasks for entities ({key: last
+        collected ts}), then recompute every task's hotness and priority.
+        """
+        now = now if now is not None else time.time()
+        velocities = velocities or {}
+        new = []
+        for kw in keywords:
+            for region in REGIONS:
+                new.append((f"search|youtube|{kw}|{region}", "youtube", "search", json.dumps([kw, region]), 0.0))
+                term_key = (PLATFORM_NAMES["trends"], f"n8n {kw}", region)
+                new.append((entity_task(term_key), "trends", "refresh", json.dumps(list(term_key)), 0.0))
+            new.append((f"search|discourse|{kw}", "discourse", "search", json.dumps([kw]), 0.0))
+        for key, ts in dict(entities).items():
+            if key[0] in PLATFORMS:
+                new.append((entity_task(key), PLATFORMS[key[0]], "refresh", json.dumps(list(key)), ts or 0.0))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO tasks (task, platform, kind, args, last_run_ts) "
+                                   "VALUES (?, ?, ?, ?, ?)", new)
+            rows = self._conn.execute("SELECT task, kind, args, last_run_ts, found FROM tasks").fetchall()
+            hot = {}
+            for task, kind, args, _, _ in rows:
+                if kind == "refresh":
+                    hot[task] = hotness(velocities.get(tuple(json.loads(args))))
+            updates = []
+            for task, kind, args, last_run_ts, found in rows:
+                if kind == "search":
+                    h = max((hot.get(entity_task(tuple(k)), 0.0) for k in json.loads(found)), default=0.0)
+                else:
+                    h = hot[task]
+                updates.append((h, priority(last_run_ts, h, now), task))
+            self._conn.executemany("UPDATE tasks SET hotness = ?, priority = ? WHERE task = ?", updates)
+        return len(rows)
+
+    def cost(self, platform, kind):
+        if kind == "search":
+            return search_cost(platform, self.forum_per_keyword)
+        return refresh_cost(platform)
+
+    def plan(self, budgets, now=None):
+        """
+        Tasks to run within budgets ({platform: units}), most valuable first:
+        ordered by priority per unit of cost, skipping tasks that no longer fit.
+        Returns ([(task, platform, kind, args)], {platform: planned spend}).
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            rows = self._conn.execute("SELECT task, platform, kind, args, priority FROM tasks "
+                                      "WHERE last_run_ts <= ? AND priority > 0", (now - self.min_age,)).fetchall()
+        queue = [(-prio / self.cost(platform, kind), task, platform, kind, args)
+                 for task, platform, kind, args, prio in rows if platform in budgets]
+        heapq.heapify(queue)
+        spent = {platform: 0.0 for platform in budgets}
+        packed = {}   # entities per packed call so far: YouTube ids run-wide, Trends terms per country
+        chosen = []
+        while queue:
+            _, task, platform, kind, args = heapq.heappop(queue)
+            args = json.loads(args)
+            cost = self.cost(platform, kind)
+            pack = None
+            if kind == "refresh" and platform in ("youtube", "trends"):
+                # the first entity of each packed call pays for the whole call
+                pack = (platform, args[2] if platform == "trends" else None)
+                per_call = youtube_collector.STATS_BATCH_SIZE if platform == "youtube" else TRENDS_TERMS_PER_PAYLOAD
+                cost = cost * per_call if packed.get(pack, 0) % per_call == 0 else 0.0
+            if spent[platform] + cost > budgets[platform]:
+                continue
+            spent[platform] += cost
+            if pack is not None:
+                packed[pack] = packed.get(pack, 0) + 1
+            chosen.append((task, platform, kind, args))
+        return chosen, spent
+
+    def complete(self, done, now=None):
+        """Record finished tasks: done is [(task, entity keys found)]; found entities get refresh tasks."""
+        now = now if now is not None else time.time()
+        with self._lock, self._conn:
+            for task, found in done:
+                self._conn.execute("UPDATE tasks SET last_run_ts = ?, priority = 0, found = ? WHERE task = ?",
+                                   (now, json.dumps([list(k) for k in found]), task))
+                for key in found:
+                    if key[0] in PLATFORMS:
+                        self._conn.execute(
+                            "INSERT INTO tasks (task, platform, kind, args, last_run_ts) VALUES (?, ?, 'refresh', ?, ?) "
+                            "ON CONFLICT (task) DO UPDATE SET last_run_ts = excluded.last_run_ts, priority = 0",
+                            (entity_task(key), PLATFORMS[key[0]], json.dumps(list(key)), now))
+
+    def top(self, n=20):
+        with self._lock:
+            return self._conn.execute("SELECT task, hotness, priority, last_run_ts FROM tasks "
+                                      "ORDER BY priority DESC LIMIT ?", (n,)).fetchall()
+
+def _youtube_refresh(ids, keys):
+    """Stats for every (video id, region) in packed videos.list calls; ids are fetched once across regions."""
+    by_id = {}
+    for i in range(0, len(ids), youtube_collector.STATS_BATCH_SIZE):
+        for st in youtube_collector.get_video_stats(ids[i:i + youtube_collector.STATS_BATCH_SIZE]):
+            by_id[st.get("id")] = st
+    return [youtube_collector._stats_record(by_id[source_id], region)
+            for _, source_id, region in keys if source_id in by_id]
+
+def _discourse_search(kw, limit):
+    topics = discourse_collector.search_topics(kw, limit=limit)
+    return [discourse_collector.fetch_topic_details(t.get("topic_id")) for t in topics]
+
+def run_scheduled(scheduler, budgets, concurrency=None):
+    """
+    Run the planned tasks on per-platform pools. Returns (fresh records, stats);
+    stats holds tasks run and budget spent per platform. A job that fails is
+    still charged its planned cost, as its calls may have reached the API.
+    """
+    chosen, planned = scheduler.plan(budgets)
+    concurrency = dict(DEFAULT_CONCURRENCY, **(concurrency or {}))
+    pools = {p: ThreadPoolExecutor(max_workers=max(1, concurrency[p]), thread_name_prefix=p) for p in PLATFORM_ORDER}
+    started = time.perf_counter()
+    jobs = []   # (platform, [tasks], future, cost)
+    refresh = {p: [] for p in PLATFORM_ORDER}
+    try:
+        for task, platform, kind, args in chosen:
+            if kind == "refresh":
+                refresh[platform].append((task, tuple(args)))
+            elif platform == "youtube":
+                fut = pools["youtube"].submit(youtube_collector.collect_for_keyword, args[0], regionCode=args[1],
+                                              maxResults=scheduler.youtube_per_keyword)
+                jobs.append(("youtube", [task], fut, scheduler.cost(platform, kind)))
+            else:
+                fut = pools["discourse"].submit(_discourse_search, args[0], scheduler.forum_per_keyword)
+                jobs.append(("discourse", [task], fut, scheduler.cost(platform, kind)))
+        if refresh["youtube"]:
+            keys = [key for _, key in refresh["youtube"]]
+            ids = list(dict.fromkeys(source_id for _, source_id, _ in keys))
+            jobs.append(("youtube", [t for t, _ in refresh["youtube"]], pools["youtube"].submit(_youtube_refresh, ids, keys),
+                         math.ceil(len(ids) / youtube_collector.STATS_BATCH_SIZE) * youtube_collector.VIDEOS_QUOTA_UNITS))
+        for task, key in refresh["discourse"]:
+            jobs.append(("discourse", [task], pools["discourse"].submit(discourse_collector.fetch_topic_details, key[1]), 1))
+        for country in REGIONS:
+            terms = [key[1] for _, key in refresh["trends"] if key[2] == country]
+            if terms:
+                jobs.append(("trends", [t for t, key in refresh["trends"] if key[2] == country],
+                             pools["trends"].submit(google_trends_collector.collect_batch, terms, country),
+                             math.ceil(len(terms) / TRENDS_TERMS_PER_PAYLOAD)))
+
+        records = {p: [] for p in PLATFORM_ORDER}
+        spent = {p: 0.0 for p in PLATFORM_ORDER}
+        done = []
+        for platform, tasks, fut, cost in jobs:
+            spent[platform] += cost
+            try:
+                result = fut.result()
+            except Exception as e:
+                print(f"Scheduled {platform} error for {len(tasks)} task(s) ({tasks[0]}): {e}")
+                continue
+            got = _stamp([r for r in (result if isinstance(result, list) else [result]) if r])
+            records[platform].extend(got)
+            found = [record_key(r) for r in got]
+            refreshed = {entity_task(key) for key in found if key[0] in PLATFORMS}
+            for task in tasks:
+                kind = task.split("|", 1)[0]
+                if kind == "refresh" and task not in refreshed:
+                    continue   # no data for this entity (e.g. its Trends payload failed): stays queued
+                TASKS_RUN.inc(platform=platform, kind=kind)
+                done.append((task, found if kind == "search" else []))
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+    scheduler.complete(done)
+    elapsed = time.perf_counter() - started
+    for platform in PLATFORM_ORDER:
+        BUDGET_SPENT.set(spent[platform], platform=platform)
+        record_throughput(platform, len(records[platform]), elapsed)
+    stats = {"tasks": len(done), "planned": planned, "spent": spent, "budgets": budgets}
+    return [r for p in PLATFORM_ORDER for r in records[p]], stats
+
+def known_entities(checkpoint):
+    """{entity key: collected ts} of every record the checkpoint holds."""
+    return {record_key(r): parse_ts(r.get("collected_at")) for r in checkpoint.all_records()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the collection task queue")
+    parser.add_argument("--path", default=SCHEDULE_PATH)
+    parser.add_argument("--show", type=int, default=20, help="print the N highest-priority tasks")
+    args = parser.parse_args()
+    scheduler = CollectionScheduler(args.path)
+    for task, hot, prio, last_run_ts in scheduler.top(args.show):
+        age = f"{(time.time() - last_run_ts) / 3600:.1f}h ago" if last_run_ts else "never"
+        print(f"{prio:>12.1f}  hot {hot:5.2f}  {age:>12}  {task}")
+    scheduler.close()
@@ -1,20 +1,29 @@
 # collectors/youtube_collector.py
 import os
-import requests
-from dotenv import load_dotenv
-load_dotenv()
+from collectors import http_client
+from collectors.env import load_env
+from collectors.records import WorkflowRecord
+from serving import metrics
+load_env()
 
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")  # optional; set in .env for real calls
 SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
 VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
 
+STATS_BATCH_SIZE = 50   # max ids per videos.list call
+SEARCH_QUOTA_UNITS = 100
+VIDEOS_QUOTA_UNITS = 1
+
+MOCK_FALLBACKS = metrics.counter("collector_mock_fallbacks_total", "Records synthesised by mock fallbacks",
+                                 ("platform", "reason"))
+
 def _mock_video_record(title, video_id, region):
     # deterministic-ish fake metrics for testing without API key
     h = abs(hash(title)) % 10000
     views = 1000 + h
     likes = max(1, (views // 20) + (h % 50))
     comments = max(0, (views // 200) + (h % 10))
-    return {
+    return WorkflowRecord.from_dict({
         "workflow": title,
         "platform": "YouTube",
         "popularity_metrics": {
@@ -28,7 +37,7 @@ def _mock_video_record(title, video_id, region):
         "score": None,
         "source_url": f"https://www.youtube.com/watch?v={video_id}",
         "collected_at": None
-    }
+    })
 
 def search_videos(keyword, regionCode=None, maxResults=3):
     """
@@ -51,7 +60,7 @@ def search_videos(keyword, regionCode=None, maxResults=3):
     }
     if regionCode:
         params["regionCode"] = regionCode
-    r = requests.get(SEARCH_URL, params=params, timeout=15)
+    r = http_client.get(SEARCH_URL, params=params, platform="youtube", endpoint="search")
     r.raise_for_status()
     js = r.json()
     items = []
@@ -76,7 +85,7 @@ def get_video_stats(video_ids):
         "id": ",".join(video_ids),
         "key": YOUTUBE_API_KEY
     }
-    r = requests.get(VIDEOS_URL, params=params, timeout=15)
+    r = http_client.get(VIDEOS_URL, params=params, platform="youtube", endpoint="videos")
     r.raise_for_status()
     js = r.json()
     out = []
@@ -92,6 +101,26 @@ def get_video_stats(video_ids):
         })
     return out
 
+def _stats_record(s, regionCode):
+    views = s.get("views", 0)
+    likes = s.get("likes", 0)
+    comments = s.get("comments", 0)
+    return WorkflowRecord.from_dict({
+        "workflow": s.get("title"),
+        "platform": "YouTube",
+        "popularity_metrics": {
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+            "like_to_view_ratio": round(likes / views, 5) if views else 0.0,
+            "comment_to_view_ratio": round(comments / views, 5) if views else 0.0
+        },
+        "country": "US" if regionCode == "US" else ("IN" if regionCode == "IN" else None),
+        "score": None,
+        "source_url": f"https://www.youtube.com/watch?v={s.get('id')}",
+        "collected_at": None
+    })
+
 def collect_for_keyword(keyword, regionCode=None, maxResults=3):
     """
     Returns a list of normalized workflow records for the given keyword and region.
@@ -106,26 +135,90 @@ def collect_for_keyword(keyword, regionCode=None, maxResults=3):
     # if real stats available, use them; else use mock
     if stats:
         for s in stats:
-            views = s.get("views", 0)
-            likes = s.get("likes", 0)
-            comments = s.get("comments", 0)
-            results.append({
-                "workflow": s.get("title"),
-                "platform": "YouTube",
-                "popularity_metrics": {
-                    "views": views,
-                    "likes": likes,
-                    "comments": comments,
-                    "like_to_view_ratio": round(likes / views, 5) if views else 0.0,
-                    "comment_to_view_ratio": round(comments / views, 5) if views else 0.0
-                },
-                "country": "US" if regionCode == "US" else ("IN" if regionCode == "IN" else None),
-                "score": None,
-                "source_url": f"https://www.youtube.com/watch?v={s.get('id')}",
-                "collected_at": None
-            })
+            results.append(_stats_record(s, regionCode))
     else:
         # mock mode
+        MOCK_FALLBACKS.inc(len(items), platform="youtube", reason="no_stats" if YOUTUBE_API_KEY else "no_api_key")
         for it in items:
             results.append(_mock_video_record(it["title"], it["videoId"], regionCode))
-    return results
\ No newline at end of file
+    return results
+
+def collect_batched(keywords, regions=("US", "IN"), maxResults=3, executor=None, stats=None, cached=None):
+    """
+    Batched mode for a whole run: search every (keyword, region) first, dedupe
+    the video ids, then fetch statistics in packed STATS_BATCH_SIZE-id calls and
+    fan the results back out to each (keyword, region) record list.
+    executor (optional) is used to run the searches and batches concurrently.
+    stats (optional dict) is filled with call and quota counts vs. the per-keyword path.
+    cached (optional {(video_id, region): record}) holds still-fresh records whose
+    statistics are not fetched again.
+    Returns records in the same (keyword, region) order as collect_for_keyword loops.
+    """
+    run_map = executor.map if executor is not None else map
+    pairs = [(kw, region) for kw in keywords for region in regions]
+
+    def search(pair):
+        try:
+            return search_videos(pair[0], regionCode=pair[1], maxResults=maxResults)
+        except Exception as e:
+            print(f"YT Error collecting for {pair[0]} {pair[1]}: {e}")
+            return []
+
+    def fetch(batch):
+        try:
+            return get_video_stats(batch)
+        except Exception as e:
+            print(f"YT Error fetching stats for {len(batch)} videos: {e}")
+            return []
+
+    searched = list(run_map(search, pairs))
+    cached = cached or {}
+
+    unique_ids = []
+    seen = set()
+    naive_calls = 0
+    for (kw, region), items in zip(pairs, searched):
+        if items:
+            naive_calls += 1
+        for it in items:
+            if (it["videoId"], region) in cached:
+                continue
+            if it["videoId"] not in seen:
+                seen.add(it["videoId"])
+                unique_ids.append(it["videoId"])
+
+    by_id = {}
+    batches = []
+    if YOUTUBE_API_KEY and unique_ids:
+        batches = [unique_ids[i:i + STATS_BATCH_SIZE] for i in range(0, len(unique_ids), STATS_BATCH_SIZE)]
+        for batch_stats in run_map(fetch, batches):
+            for st in batch_stats:
+                by_id[st.get("id")] = st
+
+    results = []
+    for (kw, region), items in zip(pairs, searched):
+        found = []
+        for it in items:
+            if (it["videoId"], region) in cached:
+                found.append(cached[(it["videoId"], region)])
+            elif it["videoId"] in by_id:
+                found.append(_stats_record(by_id[it["videoId"]], region))
+        if found:
+            results.extend(found)
+        else:
+            MOCK_FALLBACKS.inc(len(items), platform="youtube", reason="no_stats" if YOUTUBE_API_KEY else "no_api_key")
+            results.extend(_mock_video_record(it["title"], it["videoId"], region) for it in items)
+
+    if stats is not None and YOUTUBE_API_KEY:
+        total_ids = sum(len(items) for items in searched)
+        stats.update({
+            "search_calls": len(pairs),
+            "video_ids": total_ids,
+            "unique_video_ids": len(unique_ids),
+            "videos_calls": len(batches),
+            "videos_calls_unbatched": naive_calls,
+            "http_calls_saved": naive_calls - len(batches),
+            "quota_units": len(pairs) * SEARCH_QUOTA_UNITS + len(batches) * VIDEOS_QUOTA_UNITS,
+            "quota_units_saved": (naive_calls - len(batches)) * VIDEOS_QUOTA_UNITS,
+        })
+    return results
@@ -0,0 +1,109 @@
+# scripts/bench_collectors.py - sequential vs concurrent collection against a local stub API
+# usage: python -m scripts.bench_collectors --latency-ms 50 --keyword-multiplier 10
+import argparse, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from collectors import youtube_collector, discourse_collector
+from collectors.pipeline import CollectionPipeline, REGIONS
+from collectors.run_collectors import SEED_KEYWORDS
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so the pooled session is exercised
+    disable_nagle_algorithm = True
+    latency = 0.05
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        qs = parse_qs(url.query)
+        if url.path == "/youtube/v3/search":
+            q = qs.get("q", [""])[0]
+            region = qs.get("regionCode", [""])[0]
+            n = int(qs.get("maxResults", ["3"])[0])
+            items = [{"id": {"videoId": f"{abs(hash(q)) % 10**8}_{region}_{i}"},
+                      "snippet": {"title": f"{q} {region} {i}"}} for i in range(n)]
+            return self._send({"items": items})
+        if url.path == "/youtube/v3/videos":
+            ids = qs.get("id", [""])[0].split(",")
+            items = [{"id": vid, "snippet": {"title": f"video {vid}"},
+                      "statistics": {"viewCount": "1000", "likeCount": "50", "commentCount": "5"}} for vid in ids if vid]
+            return self._send({"items": items})
+        if url.path == "/search.json":
+            q = qs.get("q", [""])[0]
+            return self._send({"topics": [{"id": abs(hash(q)) % 10**6 * 10 + i, "title": f"{q} topic {i}"} for i in range(5)]})
+        if url.path.startswith("/t/"):
+            return self._send({"title": f"topic {url.path}", "posts_count": 4, "views": 120,
+                               "like_count": 3, "details": {"contributors": [1, 2]}})
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+def start_stub(latency):
+    StubHandler.latency = latency
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def point_collectors_at(base):
+    youtube_collector.YOUTUBE_API_KEY = "bench"
+    youtube_collector.SEARCH_URL = base + "/youtube/v3/search"
+    youtube_collector.VIDEOS_URL = base + "/youtube/v3/videos"
+    discourse_collector.DISCOURSE_BASE = base
+    discourse_collector.SEARCH_URL = base + "/search.json"
+    discourse_collector.TOPIC_URL_TPL = base + "/t/{topic_id}.json"
+
+def run_sequential(keywords, yt_n, forum_n):
+    # same loop shape as run_youtube_collect + run_forum_collect
+    recs = []
+    for kw in keywords:
+        for region in REGIONS:
+            recs.extend(youtube_collector.collect_for_keyword(kw, regionCode=region, maxResults=yt_n))
+    for kw in keywords:
+        recs.extend(discourse_collector.collect_for_keyword(kw, limit=forum_n))
+    return recs
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--keyword-multiplier", type=int, default=10)
+    parser.add_argument("--youtube-workers", type=int, default=16)
+    parser.add_argument("--discourse-workers", type=int, default=16)
+    args = parser.parse_args()
+
+    server = start_stub(args.latency_ms / 1000.0)
+    point_collectors_at(f"http://127.0.0.1:{server.server_address[1]}")
+    keywords = [f"{kw} {i}" for i in range(args.keyword_multiplier) for kw in SEED_KEYWORDS]
+
+    t0 = time.perf_counter()
+    seq = run_sequential(keywords, 2, 3)
+    t_seq = time.perf_counter() - t0
+
+    pipeline = CollectionPipeline(keywords, platforms=("youtube", "discourse"),
+                                  concurrency={"youtube": args.youtube_workers, "discourse": args.discourse_workers})
+    t0 = time.perf_counter()
+    conc = pipeline.run()
+    t_conc = time.perf_counter() - t0
+    server.shutdown()
+
+    print(f"keywords={len(keywords)} latency={args.latency_ms:.0f}ms")
+    print(f"sequential: {len(seq)} records in {t_seq:.2f}s")
+    print(f"concurrent: {len(conc)} records in {t_conc:.2f}s")
+    print(f"speedup:    {t_seq / t_conc:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# scripts/bench_scoring.py - per-record vs columnar scoring at increasing sizes
+# usage: python -m scripts.bench_scoring --sizes 10000 100000 1000000
+import argparse, random, time
+from scripts.score_and_dedupe import score_groups
+
+def synth_bests(n, seed=7):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.6:
+            views = rng.randint(0, 2_000_000)
+            out.append({"workflow": f"video {i}", "platform": "YouTube", "country": rng.choice(("US", "IN")),
+                        "popularity_metrics": {"views": views, "likes": rng.randint(0, views // 10 + 1),
+                                               "comments": rng.randint(0, views // 100 + 1)}})
+        elif kind < 0.9:
+            out.append({"workflow": f"topic {i}", "platform": "Discourse", "country": None,
+                        "popularity_metrics": {"replies": rng.randint(0, 80), "likes": rng.randint(0, 50),
+                                               "contributors": rng.randint(0, 10), "views": rng.randint(0, 5000)}})
+        else:
+            out.append({"workflow": f"trend {i}", "platform": "GoogleTrends", "country": "US",
+                        "popularity_metrics": {"avg_interest": rng.randint(0, 100),
+                                               "trend_30d_change": rng.randint(-100, 100)}})
+    return out
+
+def timed(engine, n):
+    bests = synth_bests(n)  # fresh input: scoring writes ratios into popularity_metrics
+    t0 = time.perf_counter()
+    cleaned = score_groups(bests, engine)
+    return time.perf_counter() - t0, cleaned
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    score_groups(synth_bests(10), "numpy")  # warm-up: keep the NumPy import out of the timings
+    print(f"{'records':>10} {'python s':>10} {'numpy s':>10} {'speedup':>8} identical")
+    for n in args.sizes:
+        t_py, a = timed("python", n)
+        t_np, b = timed("numpy", n)
+        print(f"{n:>10} {t_py:>10.3f} {t_np:>10.3f} {t_py / t_np:>7.1f}x {a == b}")
+
+if __name__ == "__main__":
+    main()
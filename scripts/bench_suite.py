@@ -0,0 +1,342 @@
+# scripts/bench_suite.py - scoring/dedupe microbenchmarks + in-process HTTP load test, checked against a baseline
+# usage: python -m scripts.bench_suite                       (compare against scripts/bench_baseline.json)
+#        python -m scripts.bench_suite --update-baseline     (record this machine's numbers)
+import argparse, gc, json, os, platform, socket, statistics, subprocess, sys, tempfile, threading, time, tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from scripts.synth_data import synth_records, write_records
+from scripts.score_and_dedupe import pick_bests, merge_clusters, score_groups, iter_records
+from scripts import score_and_dedupe
+from collectors.records import encode, record_hook
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_THRESHOLD = 0.30   # fail when >30% slower than the baseline
+
+SERVER_ENDPOINTS = [
+    "/health",
+    "/workflows?limit=100",
+    "/workflows?platform=YouTube&country=US&limit=50",
+    "/workflows/page?limit=100",
+    "/workflows/search?q=gmail+automation",
+    "/workflows/raw?limit=100",
+    "/workflows/export?platform=GoogleTrends",
+]
+APP_MAIN_ENDPOINTS = [
+    "/health",
+    "/workflows?limit=50",
+    "/workflows?platform=YouTube&country=US&limit=50",
+]
+
+# cold start: entry points timed on top of the framework they cannot avoid
+# (prerequisites) and checked against the baseline like every other number,
+# plus heavy modules they must not load at import
+IMPORT_PREREQUISITES = {
+    "server": ("fastapi",),   # most of it is FastAPI building routes (pydantic.v1)
+    "serving.shard_worker": ("fastapi",),
+    "serving.shard_router": ("fastapi",),
+    "collectors.run_collectors": (),
+    "scripts.score_and_dedupe": (),
+}
+LAZY_MODULES = ("requests", "pandas", "pytrends", "dotenv", "numpy", "uvicorn", "sortedcontainers")
+_IMPORT_PROBE = """
+import json, sys, time
+for m in sys.argv[2:]:
+    __import__(m)
+t0 = time.perf_counter()
+__import__(sys.argv[1])
+ms = (time.perf_counter() - t0) * 1000.0
+print(json.dumps({"ms": ms, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+def import_time(module, prerequisites=(), repeat=3):
+    """Best-of-repeat ms to import module in a fresh interpreter, plus any lazy module it loaded."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best, loaded = None, []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _IMPORT_PROBE, module, *prerequisites],
+                             cwd=root, capture_output=True, text=True, check=True).stdout
+        res = json.loads(out.strip().splitlines()[-1])
+        best = res["ms"] if best is None else min(best, res["ms"])
+        loaded = res["loaded"]
+    return round(best, 2), loaded
+
+def run_imports(repeat):
+    results = {}
+    for module, prereqs in IMPORT_PREREQUISITES.items():
+        ms, loaded = import_time(module, prereqs, repeat)
+        results[module] = {"ms": ms, "eager_heavy": loaded}
+        note = f"  loads {', '.join(loaded)} eagerly" if loaded else ""
+        print(f"  import {module:<30} {ms:>8.1f} ms{note}")
+    return results
+
+def best_of(repeat, setup, run):
+    """Minimum wall time of run(setup()) over repeat runs; setup is not timed."""
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        t0 = time.perf_counter()
+        run(arg)
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+def micro_cases(records, workdir):
+    """(name, setup, run) for every microbenchmark over the given raw records."""
+    n = len(records)
+    raw_path = os.path.join(workdir, "micro_raw.jsonl")
+    with open(raw_path, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, default=encode) + "\n")
+    raw_json = os.path.join(workdir, "micro_raw.json")
+    write_records(raw_json, n)
+    groups = pick_bests(records)
+
+    def fresh_bests():
+        # rebuilt per repeat, so no repeat scores an already-scored input
+        return merge_clusters(pick_bests(records))
+    cases = [
+        ("build_records", lambda: n, lambda k: sum(1 for _ in synth_records(k))),
+        ("parse_jsonl", lambda: raw_path, lambda p: sum(1 for _ in iter_records(p))),
+        ("pick_bests", lambda: records, pick_bests),
+        ("merge_exact", lambda: groups, merge_clusters),
+        ("merge_lsh_0.7", lambda: groups, lambda g: merge_clusters(g, 0.7)),
+        ("score_python", fresh_bests, lambda b: score_groups(b, "python")),
+        ("score_numpy", fresh_bests, lambda b: score_groups(b, "numpy")),
+        ("score_and_dedupe_main", lambda: None,
+         lambda _: score_and_dedupe.main(raw_json, os.path.join(workdir, "micro_scored.json"))),
+    ]
+    try:
+        from scripts.incremental_score import IncrementalScorer
+
+        def seeded():
+            scorer = IncrementalScorer()
+            scorer.upsert(records)
+            changed = []
+            for rec in records[:1000]:
+                rec = rec.copy()
+                rec["popularity_metrics"] = rec["popularity_metrics"].copy()
+                rec["popularity_metrics"]["views"] = rec["popularity_metrics"].get("views", 0) + 1
+                changed.append(rec)
+            return scorer, changed
+        cases.append(("incremental_upsert_1k", seeded, lambda s: [s[0].upsert([r]) for r in s[1]]))
+    except ImportError as e:
+        print(f"skipping incremental_upsert_1k: {e}")
+    return cases
+
+def run_micro(n, repeat, workdir):
+    records = list(synth_records(n))
+    results = {}
+    score_groups(merge_clusters(pick_bests(records[:10])), "numpy")  # keep the NumPy import out of the timings
+    for name, setup, run in micro_cases(records, workdir):
+        results[name] = round(best_of(repeat, setup, run), 6)
+        print(f"  {name:<24} {results[name]:>10.4f} s")
+    return results
+
+def traced(fn):
+    """(result, (retained bytes, peak bytes)) of allocations made by fn."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        return fn(), tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+def run_memory(n, workdir):
+    """Bytes per record: retained after the scorer's load, and peak allocation of the scoring loop."""
+    path = os.path.join(workdir, "memory_raw.json")
+    write_records(path, n)
+
+    def load():
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f, object_hook=record_hook)
+    rows, (retained, _) = traced(load)
+    bests = merge_clusters(pick_bests(rows))
+    _, (_, peak) = traced(lambda: score_groups(bests, "python"))
+    results = {"load_bytes_per_record": round(retained / n, 1), "score_peak_bytes_per_record": round(peak / len(bests), 1)}
+    for name, value in results.items():
+        print(f"  {name:<28} {value:>8.1f} B")
+    return results
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def serve_in_thread(app):
+    """Start uvicorn for app on a free localhost port; returns (server, base_url)."""
+    import uvicorn
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+def percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, max(0, int(round(q / 100.0 * len(sorted_vals))) - 1))
+    return sorted_vals[i]
+
+def load_endpoint(url, duration, concurrency):
+    """Hammer url from concurrency pooled clients for duration seconds; returns RPS and latency percentiles (ms)."""
+    def worker(deadline):
+        session = requests.Session()
+        lat = []
+        errors = 0
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            r = session.get(url)
+            r.content
+            lat.append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errors += 1
+        session.close()
+        return lat, errors
+
+    requests.get(url).content   # warm caches/indexes outside the measurement
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        parts = list(pool.map(worker, [t0 + duration] * concurrency))
+    elapsed = time.perf_counter() - t0
+    lat = sorted(x * 1000.0 for part, _ in parts for x in part)
+    return {
+        "requests": len(lat),
+        "errors": sum(e for _, e in parts),
+        "rps": round(len(lat) / elapsed, 1),
+        "p50_ms": round(percentile(lat, 50), 3),
+        "p95_ms": round(percentile(lat, 95), 3),
+        "p99_ms": round(percentile(lat, 99), 3),
+        "mean_ms": round(statistics.fmean(lat), 3) if lat else 0.0,
+    }
+
+def run_http(n, duration, concurrency, workdir):
+    raw_path = os.path.join(workdir, "http_raw.json")
+    scored_path = os.path.join(workdir, "http_scored.json")
+    write_records(raw_path, n)
+    score_and_dedupe.main(raw_path, scored_path)
+
+    import server
+    from serving.workflow_store import WorkflowStore
+    from serving.columnar import ColumnarSnapshot, columnar_path
+    server.RAW_STORE = WorkflowStore(raw_path)
+    server.SCORED_STORE = WorkflowStore(scored_path)
+    server.SCORED_COLUMNAR_STORE = WorkflowStore(columnar_path(scored_path), ColumnarSnapshot)
+    server.RESPONSE_CACHE.clear()
+    import app.main
+    app.main.DATA_PATH = raw_path
+
+    results = {}
+    for label, asgi, endpoints in (("server", server.app, SERVER_ENDPOINTS),
+                                   ("app.main", app.main.app, APP_MAIN_ENDPOINTS)):
+        uv, base = serve_in_thread(asgi)
+        try:
+            for path in endpoints:
+                name = f"{label} {path}"
+                results[name] = load_endpoint(base + path, duration, concurrency)
+                r = results[name]
+                print(f"  {name:<58} {r['rps']:>9.1f} rps  p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  "
+                      f"p99 {r['p99_ms']:>8.2f} ms" + (f"  ({r['errors']} errors)" if r["errors"] else ""))
+        finally:
+            uv.should_exit = True
+    return results
+
+def compare(current, baseline, threshold):
+    """Regression messages: import times and eager heavy imports, microbenchmarks by time, memory per record, endpoints by p95 latency and throughput."""
+    problems = []
+    for module, cur in current.get("imports", {}).items():
+        base = baseline.get("imports", {}).get(module)
+        if base and cur["ms"] > base["ms"] * (1 + threshold):
+            problems.append(f"import {module}: {cur['ms']:.1f}ms vs baseline {base['ms']:.1f}ms")
+        if cur["eager_heavy"]:
+            problems.append(f"import {module}: loads {', '.join(cur['eager_heavy'])} at import time")
+    if current["params"] != baseline.get("params"):
+        print(f"WARNING: baseline params {baseline.get('params')} differ from this run {current['params']}")
+    for name, secs in current["micro"].items():
+        base = baseline.get("micro", {}).get(name)
+        if base and secs > base * (1 + threshold):
+            problems.append(f"{name}: {secs:.4f}s vs baseline {base:.4f}s (+{(secs / base - 1) * 100:.0f}%)")
+    for name, value in current.get("memory", {}).items():
+        base = baseline.get("memory", {}).get(name)
+        if base and value > base * (1 + threshold):
+            problems.append(f"{name}: {value:.0f}B vs baseline {base:.0f}B")
+    for name, cur in current["http"].items():
+        base = baseline.get("http", {}).get(name)
+        if not base:
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            problems.append(f"{name}: p95 {cur['p95_ms']:.2f}ms vs baseline {base['p95_ms']:.2f}ms")
+        if cur["rps"] * (1 + threshold) < base["rps"]:
+            problems.append(f"{name}: {cur['rps']:.1f} rps vs baseline {base['rps']:.1f} rps")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scoring/dedupe and load-test the API")
+    parser.add_argument("--records", type=int, default=100_000, help="records for the microbenchmarks")
+    parser.add_argument("--http-records", type=int, default=10_000, help="records behind the load-tested API")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=2.0, help="seconds of load per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--skip-imports", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, 0.3 = 30%%")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", default=None, help="also write this run's results as JSON")
+    args = parser.parse_args()
+
+    current = {
+        "params": {"records": args.records, "http_records": args.http_records,
+                   "concurrency": args.concurrency},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "imports": {},
+        "micro": {},
+        "memory": {},
+        "http": {},
+    }
+    if not args.skip_imports:
+        print("cold start (fresh interpreter per import)")
+        current["imports"] = run_imports(args.repeat)
+    with tempfile.TemporaryDirectory(prefix="wf-bench-") as workdir:
+        if not args.skip_micro:
+            print(f"microbenchmarks ({args.records} records, best of {args.repeat})")
+            current["micro"] = run_micro(args.records, args.repeat, workdir)
+            print(f"memory ({args.records} records, tracemalloc)")
+            current["memory"] = run_memory(args.records, workdir)
+        if not args.skip_http:
+            print(f"HTTP load ({args.http_records} records, {args.concurrency} clients, {args.duration:.0f}s per endpoint)")
+            current["http"] = run_http(args.http_records, args.duration, args.concurrency, workdir)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if args.update_baseline:
+        if os.path.exists(args.baseline):
+            # sections this run skipped keep their recorded numbers
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            for section in ("imports", "micro", "memory", "http"):
+                if not current[section]:
+                    current[section] = previous.get(section, {})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+        print(f"WROTE baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    problems = compare(current, baseline, args.threshold)
+    for p in problems:
+        print("REGRESSION", p)
+    print("FAIL" if problems else "OK", f"(threshold {args.threshold * 100:.0f}%)")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# scripts/incremental_score.py - push-based re-scoring: upsert records, patch the ranking in place
+import argparse, json, os, sys
+from sortedcontainers import SortedList
+from collectors.checkpoint import record_key
+from collectors.records import as_record
+from scripts.score_and_dedupe import (DATA_IN, DATA_OUT, norm_title, metric_views, cluster_id,
+                                      score_best, iter_records, write_json_array, write_outputs)
+from serving.leaderboards import DEFAULT_K
+
+FLUSH_EVERY = 500   # upserts applied between output writes in service mode
+
+class IncrementalScorer:
+    """
+    Keeps score_and_dedupe's state live so a new or changed record costs one
+    group re-score instead of a full batch run. Records are identified by
+    checkpoint.record_key; an upsert replaces the earlier record in place.
+    Raw scores sit in a SortedList so the min/max bounds survive updates and
+    removals; the ranking is a SortedList of (-score, group order, key) patched
+    per group. Only when the bounds move is every score renormalised.
+    ranked() matches score_and_dedupe.main() over the same records with one
+    entry per record_key: the latest upsert, at the position of the first.
+    main() keeps every duplicate as a candidate, so inputs that repeat a key
+    can rank differently (exact-title groups; --similarity clustering and
+    --history velocity are batch-only).
+    """
+    def __init__(self, leaderboard_k=DEFAULT_K, shards=False):
+        self.leaderboard_k = leaderboard_k
+        self.shards = shards
+        self._seq = 0
+        self.members = {}    # identity -> (seq, group key, record)
+        self.groups = {}     # group key -> {identity: (views, seq, record)}
+        self.scored = {}     # group key -> (order, raw, scored record)
+        self.raws = SortedList()
+        self.ranking = SortedList()
+        self.bounds = None
+        self.stats = {"upserts": 0, "groups_rescored": 0, "patched": 0, "renormalisations": 0}
+
+    def _score(self, raw):
+        lo, hi = self.bounds
+        span = hi - lo if hi != lo else 1.0
+        return round((raw - lo) / span * 100.0, 2)
+
+    def _unrank(self, key):
+        cur = self.scored.pop(key, None)
+        if cur is not None:
+            order, raw, rec = cur
+            self.raws.remove(raw)
+            self.ranking.remove((-rec["score"], order, key))
+
+    def _rescore(self, key):
+        """Recompute one group's best and raw score; returns True if the bounds moved."""
+        self.stats["groups_rescored"] += 1
+        self._unrank(key)
+        members = self.groups.get(key)
+        if members:
+            order = min(seq for _, seq, _ in members.values())
+            # first record with the highest views, as pick_bests
+            _, _, best = max(members.values(), key=lambda m: (m[0], -m[1]))
+            best = best.copy()   # the member stays as upserted
+            best["cluster_id"] = cluster_id(key)
+            rec, raw = score_best(best)
+            self.raws.add(raw)
+            self.scored[key] = (order, raw, rec)
+        bounds = (self.raws[0], self.raws[-1]) if self.raws else None
+        if bounds != self.bounds:
+            self.bounds = bounds
+            return True
+        if members:
+            rec["score"] = self._score(raw)
+            self.ranking.add((-rec["score"], order, key))
+            self.stats["patched"] += 1
+        return False
+
+    def _renormalise(self):
+        self.stats["renormalisations"] += 1
+        entries = []
+        for key, (order, raw, rec) in self.scored.items():
+            rec["score"] = self._score(raw)
+            entries.append((-rec["score"], order, key))
+        self.ranking = SortedList(entries)
+
+    def upsert(self, records):
+        """Apply new or changed records; returns the number of groups re-scored."""
+        touched = set()
+        for r in records:
+            r = as_record(r)
+            self.stats["upserts"] += 1
+            ident = record_key(r)
+            key = norm_title(r.get("workflow") or r.get("source_url") or "")
+            prev = self.members.get(ident)
+            if prev is None:
+                seq = self._seq
+                self._seq += 1
+            else:
+                seq, old_key, _ = prev
+                self.groups[old_key].pop(ident, None)
+                if not self.groups[old_key]:
+                    del self.groups[old_key]
+                touched.add(old_key)
+            self.members[ident] = (seq, key, r)
+            self.groups.setdefault(key, {})[ident] = (metric_views(r), seq, r)
+            touched.add(key)
+        moved = False
+        for key in touched:
+            moved = self._rescore(key) or moved
+        if moved:
+            self._renormalise()
+        return len(touched)
+
+    def ranked(self):
+        """Scored group representatives, best first."""
+        return [self.scored[key][2] for _, _, key in self.ranking]
+
+    def write(self, path_out):
+        """
+        Replace the JSON atomically (readers never parse a half-written file),
+        then the .wfcol, leaderboards and (if shards) a new shard version
+        through score_and_dedupe.write_outputs.
+        """
+        ranked = self.ranked()
+        write_json_array(path_out + ".tmp", ranked)
+        os.replace(path_out + ".tmp", path_out)
+        write_outputs(path_out, ranked, {}, self.leaderboard_k, self.shards)
+        return len(ranked)
+
+def serve(scorer, stream, path_out, flush_every=FLUSH_EVERY):
+    """Read JSONL upserts from stream, writing the output after every flush_every records and at EOF."""
+    pending = []
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        pending.append(json.loads(line))
+        if len(pending) >= flush_every:
+            scorer.upsert(pending)
+            pending = []
+            print(f"WROTE {scorer.write(path_out)} records to {path_out} {scorer.stats}")
+    if pending:
+        scorer.upsert(pending)
+        print(f"WROTE {scorer.write(path_out)} records to {path_out} {scorer.stats}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally re-score upserted workflow records")
+    parser.add_argument("--base", default=DATA_IN, help="collected records to seed the state from (JSON array or JSONL)")
+    parser.add_argument("--output", default=DATA_OUT)
+    parser.add_argument("--upserts", default="-", help="JSONL file of new/changed records; '-' reads stdin")
+    parser.add_argument("--flush-every", type=int, default=FLUSH_EVERY)
+    parser.add_argument("--leaderboard-k", type=int, default=DEFAULT_K, help="records kept per precomputed leaderboard")
+    parser.add_argument("--shards", action="store_true",
+                        help="also publish (platform, country) shards as a new dataset version on every write")
+    args = parser.parse_args()
+    scorer = IncrementalScorer(args.leaderboard_k, args.shards)
+    if os.path.exists(args.base):
+        scorer.upsert(iter_records(args.base))
+    stream = sys.stdin if args.upserts == "-" else open(args.upserts, "r", encoding="utf-8")
+    with stream:
+        serve(scorer, stream, args.output, args.flush_every)
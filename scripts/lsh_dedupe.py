@@ -0,0 +1,123 @@
+# scripts/lsh_dedupe.py - MinHash/LSH near-duplicate clustering of normalized titles
+import numpy as np
+
+MAX_HASH = np.uint64((1 << 32) - 1)
+MAX_BUCKET_CHECKS = 16
+
+def lsh_params(threshold, num_perm):
+    """
+    (bands, rows) with bands * rows <= num_perm whose S-curve midpoint
+    (1/b)^(1/r) is closest to the similarity threshold.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or err < best[0]:
+            best = (err, bands, rows)
+    return best[1], best[2]
+
+class MinHasher:
+    """
+    MinHash over byte k-shingles. Shingles are rolled into 64-bit values with a
+    polynomial hash and permuted with multiply-shift hashing, all in NumPy.
+    """
+    def __init__(self, num_perm=64, shingle_size=4, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = (rng.randint(0, 1 << 62, size=num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self.b = rng.randint(0, 1 << 62, size=num_perm, dtype=np.uint64)
+
+    def _shingle_hashes(self, titles):
+        """(hashes, offsets, rows): flat shingle values and where each non-empty title starts."""
+        k = self.shingle_size
+        enc = [t.encode("utf-8") for t in titles]
+        lens = np.fromiter(map(len, enc), dtype=np.int64, count=len(enc))
+        counts = np.where(lens >= k, lens - k + 1, (lens > 0).astype(np.int64))
+        rows = np.flatnonzero(counts)
+        if not len(rows):
+            return None, None, rows
+        buf = np.frombuffer(b"".join(enc) + b"\0" * k, dtype=np.uint8).astype(np.uint64)
+        starts = np.concatenate(([0], np.cumsum(lens)[:-1]))
+        total = int(counts.sum())
+        first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        owner = np.repeat(np.arange(len(titles)), counts)
+        pos = starts[owner] + (np.arange(total) - first[owner])
+        limit = starts[owner] + lens[owner]
+        h = np.zeros(total, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for j in range(k):
+                byte = np.where(pos + j < limit, buf[pos + j], np.uint64(0))
+                h = h * np.uint64(1099511628211) + byte
+        return h, first[rows], rows
+
+    def signatures(self, titles, chunk=1024):
+        """(len(titles), num_perm) uint64 signatures; rows of empty titles are all MAX_HASH."""
+        out = np.full((len(titles), self.num_perm), MAX_HASH, dtype=np.uint64)
+        a = self.a[:, None]
+        b = self.b[:, None]
+        for start in range(0, len(titles), chunk):
+            h, offsets, rows = self._shingle_hashes(titles[start:start + chunk])
+            if not len(rows):
+                continue
+            # multiply-shift: top 32 bits of (a*x + b) mod 2^64; overflow wraps by design
+            with np.errstate(over="ignore"):
+                perm = (a * h[None, :] + b) >> np.uint64(32)
+            out[start + rows] = np.minimum.reduceat(perm, offsets, axis=1).T
+        return out
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x, y):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            # keep the earliest index as root so the first-seen title represents the cluster
+            if ry < rx:
+                rx, ry = ry, rx
+            self.parent[ry] = rx
+
+def cluster_titles(titles, threshold=0.7, num_perm=64, shingle_size=4):
+    """
+    Cluster normalized titles whose shingle Jaccard similarity is about
+    >= threshold. Titles are bucketed per LSH band; candidate pairs are only
+    joined if their estimated similarity passes the threshold, so cost stays
+    near-linear in len(titles). Returns, per title, the index of the first-seen
+    title of its cluster. Identical titles always share a cluster.
+    """
+    n = len(titles)
+    uf = _UnionFind(n)
+    sigs = MinHasher(num_perm, shingle_size).signatures(titles)
+    bands, rows = lsh_params(threshold, num_perm)
+    for band in range(bands):
+        # fold the band's rows into one 64-bit bucket key; key collisions are
+        # caught by the similarity check below
+        key = np.zeros(n, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for col in range(band * rows, (band + 1) * rows):
+                key = key * np.uint64(1099511628211) + sigs[:, col]
+        order = np.argsort(key, kind="stable")
+        sk = key[order]
+        cuts = np.flatnonzero(sk[1:] != sk[:-1]) + 1
+        for grp in np.split(order, cuts):
+            if len(grp) < 2:
+                continue
+            members = []
+            for i in grp.tolist():
+                # verify against a bounded number of earlier bucket members
+                for j in members[-MAX_BUCKET_CHECKS:]:
+                    if uf.find(j) == uf.find(i):
+                        break
+                    if titles[j] == titles[i] or np.count_nonzero(sigs[j] == sigs[i]) >= threshold * num_perm:
+                        uf.union(j, i)
+                        break
+                members.append(i)
+    return [uf.find(i) for i in range(n)]
@@ -1,10 +1,26 @@
 # scripts/score_and_dedupe.py
-import json, os, math, re
-from collections import defaultdict
+import json, os, math, re, argparse, hashlib, time
+from contextlib import contextmanager
+from collectors.records import as_record, record_hook, to_plain, paused_gc
+from serving.columnar import write_columnar, columnar_path
+from serving.leaderboards import build_boards, write_leaderboards, leaderboards_path, DEFAULT_K
+from serving.shards import write_shards, shards_dir
+from serving import metrics
 
 DATA_IN = os.path.join("data", "sample_workflows.json")
 DATA_OUT = os.path.join("data", "sample_workflows_scored.json")
 
+PHASE_SECONDS = metrics.gauge("scoring_phase_seconds", "Wall time of each scoring phase in the last run", ("phase",))
+STAGE_RECORDS = metrics.gauge("scoring_records", "Records at each scoring stage in the last run", ("stage",))
+
+@contextmanager
+def phase(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.set(round(time.perf_counter() - t0, 6), phase=name)
+
 def norm_title(t):
     if not t: return ""
     t = t.lower()
@@ -39,75 +55,311 @@ def compute_for_discourse(metrics):
     raw = 0.5 * math.log10(views + 1) + 0.3 * (like_ratio * 100.0) + 0.2 * (reply_ratio * 100.0) + 0.1 * contrib_term
     return raw
 
-def main():
-    if not os.path.exists(DATA_IN):
-        print("Input data not found at", DATA_IN)
-        return
-    with open(DATA_IN, "r", encoding="utf-8") as f:
-        rows = json.load(f)
+def metric_views(rec):
+    return safe_float(rec.get("popularity_metrics", {}).get("views", 0))
 
-    grouped = defaultdict(list)
-    # Group by normalized title (dedupe strategy)
-    for r in rows:
+def cluster_id(key):
+    """Stable id for a dedupe cluster, derived from its first-seen normalized title."""
+    return "c" + hashlib.blake2b(key.encode("utf-8"), digest_size=6).hexdigest()
+
+def pick_bests(records):
+    """
+    Best candidate per normalized title: the first record with the highest views.
+    Returns {key: (views, input index, record)} in first-seen key order; kept
+    records are WorkflowRecords, so only winners are converted from dicts.
+    """
+    best = {}
+    for idx, r in enumerate(records):
         key = norm_title(r.get("workflow") or r.get("source_url") or "")
-        grouped[key].append(r)
+        cur = best.get(key)
+        v = metric_views(r)
+        if cur is None or v > cur[0]:
+            best[key] = (v, idx, as_record(r))
+    return best
 
-    cleaned = []
-    raw_scores = []
+def merge_clusters(groups, similarity=None, members=None):
+    """
+    Collapse title groups into clusters and return one best record per cluster,
+    tagged with its cluster_id. similarity=None keeps exact normalized-title
+    groups; otherwise near-duplicate titles (MinHash/LSH, see lsh_dedupe) merge.
+    members (optional dict) is filled with {cluster_id: group best records}
+    for clusters that merged more than one title.
+    """
+    keys = list(groups)
+    if similarity is None:
+        reps = range(len(keys))
+    else:
+        from scripts.lsh_dedupe import cluster_titles
+        reps = cluster_titles(keys, threshold=similarity)
+    clusters = {}
+    grouped = {} if members is not None else None
+    for key, rep in zip(keys, reps):
+        v, idx, r = groups[key]
+        cur = clusters.get(rep)
+        if cur is None or v > cur[0] or (v == cur[0] and idx < cur[1]):
+            clusters[rep] = (v, idx, r)
+        if grouped is not None:
+            grouped.setdefault(rep, []).append(r)
+    bests = []
+    for rep, (_, _, r) in clusters.items():
+        r["cluster_id"] = cluster_id(keys[rep])
+        bests.append(r)
+        if grouped is not None and len(grouped[rep]) > 1:
+            members[r["cluster_id"]] = grouped[rep]
+    return bests
 
-    for key, items in grouped.items():
-        # pick best candidate per group as base (highest raw views or replies)
-        best = None
-        for it in items:
-            if best is None:
-                best = it
-                continue
-            # choose by views (YouTube) or replies (Discourse) or length
-            v1 = safe_float(best.get("popularity_metrics", {}).get("views", 0))
-            v2 = safe_float(it.get("popularity_metrics", {}).get("views", 0))
-            # fallback: replies
-            if v2 > v1:
-                best = it
-
-        rec = dict(best)  # shallow copy
-        pm = rec.setdefault("popularity_metrics", {})
-
-        # Ensure ratios exist
-        if rec.get("platform","").lower() == "youtube":
-            views = safe_float(pm.get("views", 0))
-            likes = safe_float(pm.get("likes", 0))
-            comments = safe_float(pm.get("comments", 0))
-            like_ratio = likes / views if views else 0.0
-            comment_ratio = comments / views if views else 0.0
-            pm["like_to_view_ratio"] = round(like_ratio, 6)
-            pm["comment_to_view_ratio"] = round(comment_ratio, 6)
-            raw = compute_youtube_raw(views, like_ratio, comment_ratio)
-        else:
-            # discourse or other
-            raw = compute_for_discourse(pm)
+def score_best(best):
+    """Copy the chosen group representative, fill in ratios and return (rec, raw score)."""
+    rec = best.copy()  # shallow copy
+    # the ratios go into a copy of the metrics too, so `best` is left as it was
+    pm = rec["popularity_metrics"] = (rec.get("popularity_metrics") or {}).copy()
 
-        rec["_raw_score"] = raw
-        raw_scores.append(raw)
-        cleaned.append(rec)
+    # Ensure ratios exist
+    if rec.get("platform","").lower() == "youtube":
+        views = safe_float(pm.get("views", 0))
+        likes = safe_float(pm.get("likes", 0))
+        comments = safe_float(pm.get("comments", 0))
+        like_ratio = likes / views if views else 0.0
+        comment_ratio = comments / views if views else 0.0
+        pm["like_to_view_ratio"] = round(like_ratio, 6)
+        pm["comment_to_view_ratio"] = round(comment_ratio, 6)
+        raw = compute_youtube_raw(views, like_ratio, comment_ratio)
+    else:
+        # discourse or other
+        raw = compute_for_discourse(pm)
+    return rec, raw
 
-    # normalize raw scores to 0-100
+def normalise(cleaned, raw_scores):
+    """Scale raw scores to 0-100 in place (rec['score']) and sort by score desc."""
     if raw_scores:
         min_r = min(raw_scores)
         max_r = max(raw_scores)
         span = max_r - min_r if max_r != min_r else 1.0
-        for rec in cleaned:
-            raw = rec.get("_raw_score", 0.0)
+        for rec, raw in zip(cleaned, raw_scores):
             norm = (raw - min_r) / span
             rec["score"] = round(norm * 100.0, 2)
-            rec.pop("_raw_score", None)
-
-    # sort by score desc
     cleaned.sort(key=lambda x: x.get("score", 0.0), reverse=True)
+    return cleaned
 
-    with open(DATA_OUT, "w", encoding="utf-8") as f:
-        json.dump(cleaned, f, indent=2, ensure_ascii=False)
+def score_groups(bests, engine="python"):
+    """Score the per-group representatives and return them normalised and sorted."""
+    if engine == "numpy":
+        # optional dependency, only needed for the columnar path
+        from scripts.vector_scoring import score_bests_columnar, normalise_columnar
+        cleaned, raw = score_bests_columnar(bests)
+        return normalise_columnar(cleaned, raw)
+    cleaned = []
+    raw_scores = []
+    for best in bests:
+        rec, raw = score_best(best)
+        raw_scores.append(raw)
+        cleaned.append(rec)
+    # normalize raw scores to 0-100, sort by score desc
+    return normalise(cleaned, raw_scores)
+
+def add_velocity(cleaned, history_path):
+    """
+    Attach growth velocity from the history store (collectors/history.py) and a
+    0-100 trend_score (log-scaled 7-day velocity, min-max normalised like score).
+    Records without enough history get neither.
+    """
+    from collectors.history import HistoryStore
+    from collectors.checkpoint import record_key
+    store = HistoryStore(history_path)
+    try:
+        vel = store.velocities()
+    finally:
+        store.close()
+    raw = []
+    for rec in cleaned:
+        v = vel.get(record_key(rec))
+        if v is None:
+            continue
+        rec["velocity"] = v
+        if v["velocity_7d"] is not None:
+            raw.append((rec, math.log10(max(v["velocity_7d"], 0.0) + 1)))
+    if raw:
+        lo = min(r for _, r in raw)
+        hi = max(r for _, r in raw)
+        span = hi - lo if hi != lo else 1.0
+        for rec, r in raw:
+            rec["trend_score"] = round((r - lo) / span * 100.0, 2)
+    return cleaned
+
+def seed_keywords():
+    # imported here: run_collectors pulls in the HTTP collectors
+    from collectors.run_collectors import SEED_KEYWORDS
+    return SEED_KEYWORDS
+
+def write_outputs(path_out, cleaned, members, leaderboard_k=DEFAULT_K, shards=False):
+    """
+    Columnar copy and top-K leaderboards next to the scored JSON (both swapped
+    in atomically), plus a new shard version for serving/shard_worker.py if shards.
+    """
+    # compact mmap-able copy for the API (see serving/columnar.py)
+    with phase("write_columnar"):
+        write_columnar(columnar_path(path_out), cleaned)
+    with phase("leaderboards"):
+        boards = build_boards(cleaned, leaderboard_k, seed_keywords(), members)
+        write_leaderboards(leaderboards_path(path_out), boards, leaderboard_k)
+    STAGE_RECORDS.set(len(boards), stage="leaderboards")
+    if shards:
+        with phase("shards"):
+            version, n = write_shards(shards_dir(path_out), cleaned)
+        print(f"WROTE {n} shards of version {version} to {shards_dir(path_out)}")
+
+def iter_records(path, chunk_size=1 << 20):
+    """
+    Yield records one at a time from a JSON array file or a JSONL file
+    (one object per line), reading chunk_size characters at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        pos = 0
+        eof = not buf
+        # skip leading whitespace / opening bracket
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = f.read(chunk_size), 0
+            eof = not buf
+        is_array = pos < len(buf) and buf[pos] == "["
+        if is_array:
+            pos += 1
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ","):
+                pos += 1
+            if pos < len(buf) and is_array and buf[pos] == "]":
+                return
+            if pos >= len(buf) and eof:
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                more = f.read(chunk_size)
+                if not more:
+                    if pos >= len(buf):
+                        return
+                    raise
+                buf, pos = buf[pos:] + more, 0
+                continue
+            if end == len(buf) and not eof:
+                # a number/literal may continue in the next chunk; objects cannot
+                if not isinstance(obj, dict):
+                    more = f.read(chunk_size)
+                    eof = not more
+                    buf, pos = buf[pos:] + more, 0
+                    continue
+            yield obj
+            pos = end
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
 
-    print(f"WROTE {len(cleaned)} cleaned records to {DATA_OUT}")
+def write_json_array(path, records, chunk_size=1024):
+    """
+    Write records chunk by chunk, byte-identical to json.dump(records, f, indent=2):
+    each chunk is one indented array with its brackets stripped.
+    """
+    encoder = json.JSONEncoder(indent=2, ensure_ascii=False)
+    with open(path, "w", encoding="utf-8") as f:
+        sep = "["
+        chunk = []
+        for rec in records:
+            chunk.append(to_plain(rec))
+            if len(chunk) >= chunk_size:
+                f.write(sep + encoder.encode(chunk)[1:-2])
+                sep, chunk = ",", []
+        if chunk:
+            f.write(sep + encoder.encode(chunk)[1:-2])
+            sep = ","
+        f.write("[]" if sep == "[" else "\n]")
+
+@paused_gc()
+def score_stream(path_in, path_out, engine="python", similarity=None, history=None, leaderboard_k=DEFAULT_K,
+                 shards=False):
+    """
+    Streaming variant of main(): records are read incrementally and only the
+    current best candidate per group is held, so peak memory is bounded by the
+    number of distinct groups rather than the input size. Output is identical.
+    """
+    with phase("read_and_group"):
+        groups = pick_bests(iter_records(path_in))
+    STAGE_RECORDS.set(len(groups), stage="groups")
+    members = {}
+    with phase("merge"):
+        bests = merge_clusters(groups, similarity, members)
+    groups.clear()
+    STAGE_RECORDS.set(len(bests), stage="clusters")
+    with phase("score"):
+        cleaned = score_groups(bests, engine)
+    if history:
+        with phase("velocity"):
+            add_velocity(cleaned, history)
+    with phase("write_json"):
+        write_json_array(path_out, cleaned)
+    write_outputs(path_out, cleaned, members, leaderboard_k, shards)
+    return len(cleaned)
+
+@paused_gc()   # every phase builds records in bulk
+def main(path_in=DATA_IN, path_out=DATA_OUT, engine="python", similarity=None, history=None,
+         leaderboard_k=DEFAULT_K, shards=False):
+    if not os.path.exists(path_in):
+        print("Input data not found at", path_in)
+        return
+    with phase("read"), open(path_in, "r", encoding="utf-8") as f:
+        rows = json.load(f, object_hook=record_hook)
+    STAGE_RECORDS.set(len(rows), stage="input")
+
+    # Group by normalized title (dedupe strategy), optionally merging near-duplicates
+    with phase("group"):
+        groups = pick_bests(rows)
+    STAGE_RECORDS.set(len(groups), stage="groups")
+    members = {}
+    with phase("merge"):
+        bests = merge_clusters(groups, similarity, members)
+    STAGE_RECORDS.set(len(bests), stage="clusters")
+    with phase("score"):
+        cleaned = score_groups(bests, engine)
+    if history:
+        with phase("velocity"):
+            add_velocity(cleaned, history)
+
+    with phase("write_json"):
+        write_json_array(path_out, cleaned)
+    write_outputs(path_out, cleaned, members, leaderboard_k, shards)
+
+    print(f"WROTE {len(cleaned)} cleaned records to {path_out} (+ {columnar_path(path_out)}, {leaderboards_path(path_out)})")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Score and dedupe collected workflow records")
+    parser.add_argument("--input", default=DATA_IN, help="JSON array, or JSONL with --stream")
+    parser.add_argument("--output", default=DATA_OUT)
+    parser.add_argument("--stream", action="store_true", help="incremental reader; memory bounded by distinct groups")
+    parser.add_argument("--engine", choices=("python", "numpy"), default="python",
+                        help="per-record scoring or the columnar NumPy path (identical output)")
+    parser.add_argument("--similarity", type=float, default=None,
+                        help="merge near-duplicate titles at this Jaccard similarity (MinHash/LSH), e.g. 0.7")
+    parser.add_argument("--history", default=None,
+                        help="history store (data/history.sqlite3) to add velocity and trend_score from")
+    parser.add_argument("--leaderboard-k", type=int, default=DEFAULT_K, help="records kept per precomputed leaderboard")
+    parser.add_argument("--shards", action="store_true",
+                        help="also publish (platform, country) shards as a new dataset version for sharded serving")
+    parser.add_argument("--profile", default=None, metavar="PATH",
+                        help="sample the run's stacks and write folded stacks (flamegraph input) to PATH")
+    args = parser.parse_args()
+    from serving.profiler import profile_to
+    with profile_to(args.profile):
+        if args.stream:
+            if not os.path.exists(args.input):
+                print("Input data not found at", args.input)
+            else:
+                n = score_stream(args.input, args.output, args.engine, args.similarity, args.history,
+                                 args.leaderboard_k, args.shards)
+                print(f"WROTE {n} cleaned records to {args.output}")
+        else:
+            main(args.input, args.output, args.engine, args.similarity, args.history, args.leaderboard_k,
+                 args.shards)
+    print(f"METRICS written to {metrics.write_textfile('scoring')}")
@@ -0,0 +1,80 @@
+# scripts/synth_data.py - reproducible synthetic collector output for benchmarks (1k-10M records)
+# usage: python -m scripts.synth_data --records 1000000 --output data/synth_1m.jsonl
+import argparse, json, random
+from collectors.records import WorkflowRecord, encode
+from collectors.youtube_collector import _mock_video_record
+from collectors.discourse_collector import _mock_topic_record
+from scripts.score_and_dedupe import write_json_array
+
+TOPICS = ["gmail automation", "google sheets", "slack integration", "whatsapp reminders", "twilio sms",
+          "airtable sync", "shopify orders", "pdf parsing", "webhook", "jira automation",
+          "notion backup", "openai agent", "telegram bot", "hubspot crm", "postgres etl"]
+ACTIONS = ["tutorial", "workflow", "template", "step by step", "explained", "in 5 minutes", "for beginners"]
+COLLECTED_AT = "2025-01-01T00:00:00Z"   # fixed so generated files are byte-for-byte reproducible
+
+def synth_title(rng, distinct):
+    """Title drawn from `distinct` variants; a share get punctuation/case noise for near-duplicate dedupe."""
+    i = rng.randrange(distinct)
+    title = f"{TOPICS[i % len(TOPICS)]} {ACTIONS[(i // len(TOPICS)) % len(ACTIONS)]} #{i}"
+    r = rng.random()
+    if r < 0.1:
+        return title.upper() + "!!"
+    if r < 0.15:
+        return "n8n: " + title
+    return title
+
+def synth_records(n, seed=7, dup_rate=0.3):
+    """
+    Yield n collector-shaped records (60% YouTube, 30% Discourse, 10% Google Trends).
+    Shapes come from the collectors' own _mock_* builders; metrics are re-drawn
+    from a seeded RNG because the mocks hash titles (randomised per process).
+    dup_rate is the expected share of records whose normalized title repeats.
+    """
+    rng = random.Random(seed)
+    distinct = max(1, int(n * (1.0 - dup_rate)))
+    for i in range(n):
+        title = synth_title(rng, distinct)
+        kind = rng.random()
+        if kind < 0.6:
+            region = rng.choice(("US", "IN"))
+            rec = _mock_video_record(title, f"synth{i:08d}", region)
+            pm = rec["popularity_metrics"]
+            views = int(rng.paretovariate(1.2) * 500)
+            pm["views"] = views
+            pm["likes"] = rng.randint(0, views // 10 + 1)
+            pm["comments"] = rng.randint(0, views // 100 + 1)
+            pm["like_to_view_ratio"] = round(pm["likes"] / views, 5) if views else 0.0
+            pm["comment_to_view_ratio"] = round(pm["comments"] / views, 5) if views else 0.0
+        elif kind < 0.9:
+            rec = _mock_topic_record(title, 100000 + i)
+            rec["popularity_metrics"].update(replies=rng.randint(0, 80), likes=rng.randint(0, 50),
+                                             contributors=rng.randint(1, 10), views=rng.randint(0, 20000))
+        else:
+            rec = WorkflowRecord.from_dict({"workflow": title, "platform": "GoogleTrends",
+                                            "popularity_metrics": {"avg_interest": rng.randint(0, 100),
+                                                                   "trend_30d_change": rng.randint(-100, 100)},
+                                            "country": rng.choice(("US", "IN")),
+                                            "source_url": f"https://trends.google.com/trends/explore?q={title}"})
+        rec["collected_at"] = COLLECTED_AT
+        yield rec
+
+def write_records(path, n, seed=7, dup_rate=0.3):
+    """JSONL for *.jsonl paths (constant memory), otherwise a JSON array like run_collectors writes."""
+    records = synth_records(n, seed, dup_rate)
+    if path.endswith(".jsonl"):
+        with open(path, "w", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False, default=encode))
+                f.write("\n")
+    else:
+        write_json_array(path, records)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic workflow records")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--output", required=True, help="*.jsonl for JSON lines, anything else for a JSON array")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dup-rate", type=float, default=0.3)
+    args = parser.parse_args()
+    write_records(args.output, args.records, args.seed, args.dup_rate)
+    print(f"WROTE {args.records} records to {args.output}")
@@ -1,20 +1,92 @@
 # server.py - serves raw and scored workflow JSON
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from typing import Optional
-import json, os, uvicorn
+from contextlib import asynccontextmanager
+import os, time
+from serving.workflow_store import WorkflowStore, iter_json, to_json, dumps_compact
+from serving.columnar import ColumnarSnapshot, columnar_path
+from serving.response_cache import ResponseCache, etag_matches
+from serving.pagination import page_json
+from serving.search import index_for
+from serving.rising import top_rising, RISING_KEYS
+from serving.leaderboards import Leaderboards, leaderboards_path, top_key, keyword_key, cluster_key, WINDOWS
+from serving import metrics
 
-app = FastAPI(title="n8n Workflow Popularity - Quick Server")
+@asynccontextmanager
+async def lifespan(app):
+    # uvicorn finishes startup before it accepts connections, so a preloading
+    # worker never answers its first requests from a cold store
+    if os.getenv("PRELOAD_DATASET") == "1":
+        print(f"PRELOADED {preload(os.getenv('PRELOAD_SEARCH_INDEX') == '1')}")
+    yield
+
+app = FastAPI(title="n8n Workflow Popularity - Quick Server", lifespan=lifespan)
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 RAW_PATH = os.path.join(BASE_DIR, "data", "sample_workflows.json")
 SCORED_PATH = os.path.join(BASE_DIR, "data", "sample_workflows_scored.json")
 
-def load_json(path):
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail=f"data file not found: {path}")
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+RAW_STORE = WorkflowStore(RAW_PATH)
+SCORED_STORE = WorkflowStore(SCORED_PATH)
+# written by score_and_dedupe next to the JSON; preferred when present
+SCORED_COLUMNAR_STORE = WorkflowStore(columnar_path(SCORED_PATH), ColumnarSnapshot)
+# top-K boards materialised by score_and_dedupe
+LEADERBOARD_STORE = WorkflowStore(leaderboards_path(SCORED_PATH), Leaderboards)
+
+def scored_store():
+    if SCORED_COLUMNAR_STORE.exists():
+        return SCORED_COLUMNAR_STORE
+    return SCORED_STORE if SCORED_STORE.exists() else None
+
+RESPONSE_CACHE = ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")))
+# /debug/profile is off unless ENABLE_PROFILER=1: it samples every thread for the requested window
+ENABLE_PROFILER = os.getenv("ENABLE_PROFILER") == "1"
+
+CACHE_EVENTS = metrics.counter("api_response_cache_total", "Response cache lookups and 304s", ("event",))
+CACHE_HIT_RATE = metrics.gauge("api_response_cache_hit_rate", "Response cache hits / lookups")
+CACHE_ENTRIES = metrics.gauge("api_response_cache_entries", "Encoded responses held in the cache")
+DATASET_RECORDS = metrics.gauge("api_dataset_records", "Records in the served scored snapshot", ("store",))
+
+def cached_json(request, store, key, build):
+    """
+    Serve build(snapshot) -> bytes through the response cache. The key is
+    extended with the dataset version, so a data refresh invalidates it, and
+    the version goes out as X-Dataset-Version.
+    """
+    snap = load_snapshot(store)
+    entry = RESPONSE_CACHE.get_or_build((store.path, snap.version) + key, lambda: build(snap))
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "X-Dataset-Version": snap.version}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        RESPONSE_CACHE.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def preload(search=False):
+    """
+    Map every dataset artifact now; returns seconds per artifact. The BM25
+    index costs memory in proportion to the dataset, so it is built on the
+    first /workflows/search unless search is set.
+    """
+    timings = {}
+    for name, store in (("scored", scored_store()), ("raw", RAW_STORE), ("leaderboards", LEADERBOARD_STORE)):
+        if store is None or not store.exists():
+            continue
+        t0 = time.perf_counter()
+        snap = store.snapshot()
+        timings[name] = round(time.perf_counter() - t0, 4)
+        if search and name == "scored":
+            t0 = time.perf_counter()
+            index_for(snap)
+            timings["search_index"] = round(time.perf_counter() - t0, 4)
+    return timings
+
+def load_snapshot(store):
+    try:
+        return store.snapshot()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"data file not found: {store.path}")
 
 @app.get("/")
 def root():
@@ -24,31 +96,181 @@ def root():
 def health():
     return {"status": "ok"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return RESPONSE_CACHE.stats()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text format: this process's API metrics plus the collectors'/scorer's last run."""
+    stats = RESPONSE_CACHE.stats()
+    for event in ("hits", "misses", "evictions", "not_modified"):
+        CACHE_EVENTS.set_total(stats[event], event=event)
+    CACHE_HIT_RATE.set(stats["hit_rate"])
+    CACHE_ENTRIES.set(stats["entries"])
+    store = scored_store()
+    if store is not None:
+        try:
+            DATASET_RECORDS.set(len(store.snapshot().select()), store=os.path.basename(store.path))
+        except (OSError, ValueError):
+            pass
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile")
+def debug_profile(seconds: float = Query(5.0, gt=0, le=60), interval_ms: float = Query(5.0, ge=1, le=100)):
+    """Sample all threads for `seconds` and return folded stacks (flamegraph.pl / speedscope input)."""
+    if not ENABLE_PROFILER:
+        raise HTTPException(status_code=404, detail="profiler disabled; set ENABLE_PROFILER=1")
+    from serving.profiler import SamplingProfiler
+    prof = SamplingProfiler(interval_ms / 1000.0).start()
+    time.sleep(seconds)
+    return PlainTextResponse(prof.stop().collapsed())
+
 @app.get("/workflows")
-def workflows(platform: Optional[str] = Query(None), country: Optional[str] = Query(None), limit: int = Query(100, ge=1, le=1000)):
+def workflows(request: Request, platform: Optional[str] = Query(None), country: Optional[str] = Query(None), limit: int = Query(100, ge=1, le=1000)):
     """
     Default: return the scored dataset if available, else fall back to raw.
     Supports optional filtering by platform and country and a limit.
     """
-    path = SCORED_PATH if os.path.exists(SCORED_PATH) else RAW_PATH
-    data = load_json(path)
-    if platform:
-        data = [d for d in data if str(d.get("platform","")).lower() == platform.lower()]
-    if country:
-        data = [d for d in data if (d.get("country") or "").lower() == country.lower()]
-    return JSONResponse(content=data[:limit])
+    store = scored_store() or RAW_STORE
+    key = ("workflows", (platform or "").lower(), (country or "").lower(), limit)
+    return cached_json(request, store, key, lambda snap: snap.top_json(platform, country, limit))
+
+@app.get("/workflows/page")
+def workflows_page(platform: Optional[str] = Query(None), country: Optional[str] = Query(None),
+                   limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = Query(None)):
+    """
+    Score-ordered pages over the same data as /workflows. Pass next_cursor from
+    the previous page as cursor; it stays valid across a data refresh.
+    """
+    store = scored_store() or RAW_STORE
+    snap = load_snapshot(store)
+    try:
+        body = page_json(snap, platform, country, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type="application/json", headers={"X-Dataset-Version": snap.version})
+
+EXPORT_CHUNK = 256
+
+@app.get("/workflows/export")
+def workflows_export(platform: Optional[str] = Query(None), country: Optional[str] = Query(None)):
+    """
+    Whole ranking as NDJSON, written while iterating the snapshot, so memory
+    stays constant and the first bytes go out immediately.
+    """
+    store = scored_store() or RAW_STORE
+    snap = load_snapshot(store)
+    selection = snap.select(platform, country)
+
+    def lines():
+        chunk = []
+        for line in iter_json(selection):
+            chunk.append(line)
+            if len(chunk) >= EXPORT_CHUNK:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"X-Dataset-Version": snap.version})
+
+@app.get("/workflows/search")
+def workflows_search(q: str = Query(..., min_length=1), platform: Optional[str] = Query(None),
+                     country: Optional[str] = Query(None), limit: int = Query(20, ge=1, le=100)):
+    """
+    Title search over the scored (else raw) dataset. All query words must match;
+    results are ranked by BM25 relevance blended with the popularity score.
+    """
+    store = scored_store() or RAW_STORE
+    snap = load_snapshot(store)
+    index = index_for(snap)
+    items = []
+    for rank, row in index.search(q, platform, country, limit):
+        rec = index.record(row).copy()
+        rec["search_rank"] = round(rank, 4)
+        items.append(rec)
+    return Response(content=dumps_compact(items), media_type="application/json",
+                    headers={"X-Dataset-Version": snap.version})
+
+@app.get("/workflows/rising")
+def workflows_rising(request: Request, platform: Optional[str] = Query(None), country: Optional[str] = Query(None),
+                     limit: int = Query(20, ge=1, le=1000), by: str = Query("velocity_7d")):
+    """
+    Fastest-rising workflows by growth of their primary metric (views/day),
+    from scorer runs with --history. by: velocity_7d, velocity_30d or acceleration.
+    """
+    if by not in RISING_KEYS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(RISING_KEYS)}")
+    store = scored_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Scored data not found. Run scoring script first.")
+    key = ("rising", (platform or "").lower(), (country or "").lower(), limit, by)
+    return cached_json(request, store, key,
+                       lambda snap: to_json(top_rising(snap, platform, country, limit, by)))
+
+@app.get("/leaderboards")
+def leaderboards(request: Request, platform: Optional[str] = Query(None), country: Optional[str] = Query(None),
+                 window: str = Query("all_time"), keyword: Optional[str] = Query(None),
+                 cluster: Optional[str] = Query(None), limit: int = Query(20, ge=1, le=1000)):
+    """
+    Precomputed top-K boards: by (platform, country) for a window (all_time
+    by score, 7d/30d by velocity), or by keyword, or the titles merged into a
+    cluster. Lookups hit a ready-encoded board; nothing is filtered per request.
+    """
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {', '.join(WINDOWS)}")
+    if not LEADERBOARD_STORE.exists():
+        raise HTTPException(status_code=404, detail="Leaderboards not found. Run scoring script first.")
+    if cluster:
+        key = cluster_key(cluster)
+    elif keyword:
+        key = keyword_key(keyword)
+    else:
+        key = top_key(window, platform, country)
+    if (cluster or keyword) and key not in load_snapshot(LEADERBOARD_STORE):
+        raise HTTPException(status_code=404, detail=f"no leaderboard {key}")
+    # a (platform, country) pair without records has no board: same empty list as /workflows
+    return cached_json(request, LEADERBOARD_STORE, ("leaderboard", key, limit),
+                       lambda boards: boards.json_bytes(key, limit) if key in boards else b"[]")
+
+@app.get("/leaderboards/index")
+def leaderboards_index():
+    """Every materialised board key with its record count."""
+    if not LEADERBOARD_STORE.exists():
+        raise HTTPException(status_code=404, detail="Leaderboards not found. Run scoring script first.")
+    boards = load_snapshot(LEADERBOARD_STORE)
+    return {"k": boards.k, "version": boards.version,
+            "boards": {key: boards.count(key) for key in boards.boards}}
 
 @app.get("/workflows/raw")
-def workflows_raw(limit: int = Query(100, ge=1, le=1000)):
-    data = load_json(RAW_PATH)
-    return JSONResponse(content=data[:limit])
+def workflows_raw(request: Request, limit: int = Query(100, ge=1, le=1000)):
+    return cached_json(request, RAW_STORE, ("raw", limit), lambda snap: snap.top_json(limit=limit))
 
 @app.get("/workflows/scored")
-def workflows_scored(limit: int = Query(100, ge=1, le=1000)):
-    if not os.path.exists(SCORED_PATH):
+def workflows_scored(request: Request, limit: int = Query(100, ge=1, le=1000)):
+    store = scored_store()
+    if store is None:
         raise HTTPException(status_code=404, detail="Scored data not found. Run scoring script first.")
-    data = load_json(SCORED_PATH)
-    return JSONResponse(content=data[:limit])
+    return cached_json(request, store, ("scored", limit), lambda snap: snap.top_json(limit=limit))
 
 if __name__ == "__main__":
-    uvicorn.run("server:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    import argparse
+    import uvicorn  # only the launcher needs it; `uvicorn server:app` imports it anyway
+    parser = argparse.ArgumentParser(description="Serve the workflow API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--reload", action="store_true", help="development: restart on code changes, no preloading")
+    parser.add_argument("--preload-search", action="store_true",
+                        help="also build the search index in every worker before taking traffic")
+    args = parser.parse_args()
+    if args.preload_search:
+        os.environ["PRELOAD_SEARCH_INDEX"] = "1"
+    if args.reload:
+        uvicorn.run("server:app", host=args.host, port=args.port, reload=True)
+    else:
+        # production: every worker (they inherit the env) preloads before taking traffic
+        os.environ["PRELOAD_DATASET"] = "1"
+        uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers, access_log=False)
\ No newline at end of file
@@ -0,0 +1,188 @@
+# serving/columnar.py - compact columnar dataset artifact, served through mmap
+#
+# Layout (native byte order, sections 8-byte aligned):
+#   MAGIC | u64 directory length | directory (JSON, O(#keys) not O(#records)) | sections
+# Sections:
+#   score     float64[n]     scores, rows sorted by score desc (NaN for unscored)
+#   platform  uint16[n]      codes into directory["strings"]
+#   country   uint16[n]      codes into directory["strings"]
+#   rec_off   uint64[n + 1]  offsets into "records"
+#   records   bytes          each record as compact JSON (the bytes JSONResponse would send)
+#   postings  uint32[]       row ids per index key, in score order
+#   rank      uint32[n]      optional: each row's position in the whole dataset (shards, see serving/shards.py)
+import json, mmap, os, struct, sys
+from array import array
+from serving.workflow_store import platform_key, country_key, score_key, dumps_compact
+
+MAGIC = b"WFCOL\x00\x01\x00"
+EXTENSION = ".wfcol"
+
+def columnar_path(json_path):
+    return os.path.splitext(json_path)[0] + EXTENSION
+
+def _pad(buf):
+    buf.extend(b"\x00" * (-len(buf) % 8))
+
+def write_columnar(path, records, ranks=None):
+    """
+    Write records (any order; stored sorted by score desc, stable) to path
+    atomically: a temp file is renamed over the old one, so readers that
+    already mapped the previous version keep a consistent view.
+    ranks, if given, are stored per record (a shard's rows' global positions).
+    """
+    if ranks is None:
+        records = sorted(records, key=score_key, reverse=True)
+    else:
+        pairs = sorted(zip(records, ranks), key=lambda pair: score_key(pair[0]), reverse=True)
+        records = [rec for rec, _ in pairs]
+        ranks = array("I", (rank for _, rank in pairs))
+    strings, codes = [], {}
+
+    def code(value):
+        if value not in codes:
+            codes[value] = len(strings)
+            strings.append(value)
+        return codes[value]
+
+    score = array("d")
+    plat = array("H")
+    ctry = array("H")
+    rec_off = array("Q", [0])
+    blob = bytearray()
+    postings = {}
+    for i, rec in enumerate(records):
+        s = rec.get("score")
+        score.append(float(s) if isinstance(s, (int, float)) else float("nan"))
+        plat.append(code(rec.get("platform")))
+        ctry.append(code(rec.get("country")))
+        blob += dumps_compact(rec)
+        rec_off.append(len(blob))
+        p = platform_key(rec.get("platform", ""))
+        c = country_key(rec.get("country"))
+        for key in (f"p:{p}", f"c:{c}", f"pc:{p}|{c}"):
+            postings.setdefault(key, array("I")).append(i)
+
+    body = bytearray()
+    sections = {}
+    post = array("I")
+    post_dir = {}
+    for key, rows in postings.items():
+        post_dir[key] = [len(post), len(rows)]
+        post.extend(rows)
+    columns = [("score", score), ("platform", plat), ("country", ctry),
+               ("rec_off", rec_off), ("records", blob), ("postings", post)]
+    if ranks is not None:
+        columns.append(("rank", ranks))
+    for name, data in columns:
+        raw = data.tobytes() if isinstance(data, array) else bytes(data)
+        sections[name] = [len(body), len(raw)]
+        body += raw
+        _pad(body)
+
+    directory = json.dumps({"n": len(records), "byteorder": sys.byteorder, "strings": strings,
+                            "sections": sections, "postings": post_dir}).encode("utf-8")
+    header = bytearray(MAGIC + struct.pack("<Q", len(directory)) + directory)
+    _pad(header)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp, path)
+    return len(records)
+
+class _Rows:
+    """Lazy, score-ordered selection of rows; records are decoded only on access."""
+    def __init__(self, snap, ids):
+        self._snap = snap
+        self._ids = ids  # range or memoryview of uint32 row ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return _Rows(self._snap, self._ids[i])
+        return self._snap.record(self._ids[i])
+
+    def __iter__(self):
+        for row in self._ids:
+            yield self._snap.record(row)
+
+    def iter_json(self):
+        for row in self._ids:
+            yield self._snap.record_bytes(row)
+
+    def json_bytes(self):
+        return b"[" + b",".join(self.iter_json()) + b"]"
+
+class ColumnarSnapshot:
+    """
+    Read-only mmap view of a columnar artifact. Nothing is parsed up front but
+    the small directory, so startup cost and private memory stay flat as the
+    dataset grows, and every worker shares the same page cache.
+    Offers the same select/top/top_json surface as workflow_store.Snapshot.
+    """
+    @classmethod
+    def load(cls, path, signature):
+        return cls(path, signature)
+
+    def __init__(self, path, signature=None):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"not a workflow columnar file: {path}")
+        (dir_len,) = struct.unpack_from("<Q", mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        directory = json.loads(mm[start:start + dir_len])
+        if directory["byteorder"] != sys.byteorder:
+            raise ValueError(f"columnar file written with {directory['byteorder']}-endian columns: {path}")
+        base = start + dir_len + (-(start + dir_len) % 8)
+        view = memoryview(mm)
+
+        def section(name, fmt=None):
+            off, length = directory["sections"][name]
+            sec = view[base + off:base + off + length]
+            return sec.cast(fmt) if fmt else sec
+
+        self.path = path
+        self.signature = signature
+        self.version = f"{signature[0]:x}-{signature[1]:x}" if signature else None
+        self.n = directory["n"]
+        self.strings = directory["strings"]
+        self.score = section("score", "d")
+        self.platform = section("platform", "H")
+        self.country = section("country", "H")
+        self._rec_off = section("rec_off", "Q")
+        self._records = section("records")
+        self._postings = section("postings", "I")
+        self._post_dir = directory["postings"]
+        self.rank = section("rank", "I") if "rank" in directory["sections"] else None
+
+    def __len__(self):
+        return self.n
+
+    def record_bytes(self, row):
+        return bytes(self._records[self._rec_off[row]:self._rec_off[row + 1]])
+
+    def record(self, row):
+        return json.loads(self.record_bytes(row))
+
+    def _posting(self, key):
+        off, length = self._post_dir.get(key, (0, 0))
+        return self._postings[off:off + length]
+
+    def select(self, platform=None, country=None):
+        if platform and country:
+            return _Rows(self, self._posting(f"pc:{platform.lower()}|{country.lower()}"))
+        if platform:
+            return _Rows(self, self._posting(f"p:{platform.lower()}"))
+        if country:
+            return _Rows(self, self._posting(f"c:{country.lower()}"))
+        return _Rows(self, range(self.n))
+
+    def top(self, platform=None, country=None, limit=100):
+        return list(self.select(platform, country)[:limit])
+
+    def top_json(self, platform=None, country=None, limit=100):
+        return self.select(platform, country)[:limit].json_bytes()
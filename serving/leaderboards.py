@@ -0,0 +1,153 @@
+# serving/leaderboards.py - precomputed top-K leaderboards, served by key lookup through mmap
+#
+# Layout (native byte order):
+#   MAGIC | u64 directory length | directory (JSON) | pad to 8 | body
+# directory["boards"][key] = [ends offset, count, items offset] into body, where
+#   ends   uint32[count]  end of each item, relative to the items offset
+#   items  bytes          compact JSON records joined by ","
+# so the top `limit` of a board is b"[" + items[:ends[limit - 1]] + b"]".
+import json, mmap, os, struct, sys
+from array import array
+from serving.workflow_store import platform_key, country_key, score_key, dumps_compact
+
+MAGIC = b"WFLB\x00\x01\x00\x00"
+EXTENSION = ".wflb"
+DEFAULT_K = 100
+ALL = "*"
+# window -> velocity field ranked by; all_time ranks by score
+WINDOWS = {"all_time": None, "7d": "velocity_7d", "30d": "velocity_30d"}
+
+def leaderboards_path(json_path):
+    return os.path.splitext(json_path)[0] + EXTENSION
+
+def top_key(window="all_time", platform=None, country=None):
+    p = platform_key(platform) if platform else ALL
+    c = country_key(country) if country else ALL
+    return f"top|{window}|{p}|{c}"
+
+def keyword_key(keyword):
+    from scripts.score_and_dedupe import norm_title
+    return f"keyword|{norm_title(keyword)}"
+
+def cluster_key(cluster_id):
+    return f"cluster|{cluster_id}"
+
+def build_boards(records, k=DEFAULT_K, keywords=(), clusters=None):
+    """
+    {key: records} for every (window, platform, country) with ALL rollups, one
+    board per keyword (titles containing all of its words) and one per
+    multi-title cluster (clusters: {cluster_id: member records}, by views).
+    Each board holds at most k records in rank order.
+    """
+    from scripts.score_and_dedupe import norm_title, metric_views
+    boards = {}
+
+    def fan_out(window, rec):
+        p = platform_key(rec.get("platform", ""))
+        c = country_key(rec.get("country"))
+        for pk in (p, ALL):
+            for ck in (c, ALL):
+                board = boards.setdefault(f"top|{window}|{pk}|{ck}", [])
+                if len(board) < k:
+                    board.append(rec)
+
+    ranked = sorted(records, key=score_key, reverse=True)
+    for rec in ranked:
+        fan_out("all_time", rec)
+    for window, field in WINDOWS.items():
+        if field is None:
+            continue
+        rising = [rec for rec in ranked if (rec.get("velocity") or {}).get(field) is not None]
+        rising.sort(key=lambda rec: rec["velocity"][field], reverse=True)
+        for rec in rising:
+            fan_out(window, rec)
+
+    wanted = {f"keyword|{norm_title(kw)}": set(norm_title(kw).split()) for kw in keywords}
+    wanted = {key: words for key, words in wanted.items() if words}
+    if wanted:
+        for rec in ranked:
+            words = set(norm_title(rec.get("workflow") or "").split())
+            for key, need in wanted.items():
+                if need <= words:
+                    board = boards.setdefault(key, [])
+                    if len(board) < k:
+                        board.append(rec)
+        for key in wanted:
+            boards.setdefault(key, [])
+
+    for cid, members in (clusters or {}).items():
+        boards[cluster_key(cid)] = sorted(members, key=metric_views, reverse=True)[:k]
+    return boards
+
+def write_leaderboards(path, boards, k=DEFAULT_K):
+    """Write boards to path atomically (temp file + rename): readers see the old or the new set, never a mix."""
+    body = bytearray()
+    directory = {}
+    for key, recs in boards.items():
+        ends = array("I")
+        items = bytearray()
+        for rec in recs:
+            if items:
+                items += b","
+            items += dumps_compact(rec)
+            ends.append(len(items))
+        ends_off = len(body)
+        body += ends.tobytes()
+        items_off = len(body)
+        body += items
+        body.extend(b"\x00" * (-len(body) % 4))
+        directory[key] = [ends_off, len(recs), items_off]
+    header = json.dumps({"k": k, "byteorder": sys.byteorder, "boards": directory}).encode("utf-8")
+    head = bytearray(MAGIC + struct.pack("<Q", len(header)) + header)
+    head.extend(b"\x00" * (-len(head) % 8))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(head)
+        f.write(body)
+    os.replace(tmp, path)
+    return len(directory)
+
+class Leaderboards:
+    """
+    Read-only mmap view of a leaderboard file. Only the directory is parsed;
+    a lookup is one dict probe plus one slice of already-encoded JSON.
+    Loadable through workflow_store.WorkflowStore for reload-on-change.
+    """
+    @classmethod
+    def load(cls, path, signature):
+        return cls(path, signature)
+
+    def __init__(self, path, signature=None):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"not a leaderboard file: {path}")
+        (dir_len,) = struct.unpack_from("<Q", mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        directory = json.loads(mm[start:start + dir_len])
+        if directory["byteorder"] != sys.byteorder:
+            raise ValueError(f"leaderboard file written with {directory['byteorder']}-endian offsets: {path}")
+        self._base = start + dir_len + (-(start + dir_len) % 8)
+        self._view = memoryview(mm)
+        self.boards = directory["boards"]
+        self.k = directory["k"]
+        self.path = path
+        self.signature = signature
+        self.version = f"{signature[0]:x}-{signature[1]:x}" if signature else None
+
+    def __contains__(self, key):
+        return key in self.boards
+
+    def count(self, key):
+        return self.boards[key][1]
+
+    def json_bytes(self, key, limit=None):
+        """Top `limit` records of the board as a JSON array (KeyError for unknown keys)."""
+        ends_off, count, items_off = self.boards[key]
+        n = count if limit is None else min(limit, count)
+        if n == 0:
+            return b"[]"
+        base = self._base
+        end = self._view[base + ends_off:base + ends_off + 4 * count].cast("I")[n - 1]
+        return b"[" + self._view[base + items_off:base + items_off + end] + b"]"
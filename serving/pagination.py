@@ -0,0 +1,60 @@
+# serving/pagination.py - score-ordered cursor pagination over a snapshot selection
+import base64, bisect, json
+from serving.workflow_store import score_key, to_json, dumps_compact
+
+def encode_cursor(version, position, rec):
+    """Opaque cursor pointing just after rec (at position) in a given dataset version."""
+    score = rec.get("score")
+    payload = [version, position, score if isinstance(score, (int, float)) else None, rec.get("source_url")]
+    return base64.urlsafe_b64encode(dumps_compact(payload)).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, position, score, url = json.loads(raw)
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(position, int) or position < 0:
+        raise ValueError("invalid cursor")
+    return version, position, score, url
+
+def resume_position(selection, version, cursor):
+    """
+    Index of the first record after the cursor. Same version: the stored position.
+    After a refresh: binary search for the cursor's score, then skip past the
+    cursor record among equal scores (falling back to the first tie, so a page
+    may repeat rather than skip records). Ties keep file order, not a sortable
+    key, so that skip is a scan over the tie run: checked first at the stored
+    position (unchanged prefix), but O(ties) otherwise, which is O(n) on raw
+    data where every score is None.
+    """
+    c_version, position, score, url = cursor
+    if c_version == version:
+        return position
+    neg = -(score if score is not None else float("-inf"))
+    key = lambda rec: -score_key(rec)
+    start = bisect.bisect_left(selection, neg, key=key)
+    end = bisect.bisect_right(selection, neg, key=key)
+    if start < position <= end and selection[position - 1].get("source_url") == url:
+        return position
+    for i in range(start, end):
+        if selection[i].get("source_url") == url:
+            return i + 1
+    return start
+
+def page_json(snap, platform=None, country=None, limit=100, cursor=None):
+    """
+    {"version", "items", "next_cursor"} for one page, as bytes.
+    Costs O(limit); with a cursor from an older version add O(log n) plus the
+    tie scan in resume_position (O(n) worst case, on unscored raw data).
+    """
+    selection = snap.select(platform, country)
+    start = resume_position(selection, snap.version, decode_cursor(cursor)) if cursor else 0
+    items = selection[start:start + limit]
+    next_cursor = None
+    if start + limit < len(selection) and len(items):
+        last = start + len(items) - 1
+        next_cursor = encode_cursor(snap.version, last + 1, selection[last])
+    return (b'{"version":' + dumps_compact(snap.version) + b',"items":' + to_json(items) +
+            b',"next_cursor":' + dumps_compact(next_cursor) + b"}")
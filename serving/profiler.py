@@ -0,0 +1,75 @@
+# serving/profiler.py - optional low-overhead sampling profiler (folded stacks for flamegraphs)
+import os, sys, threading
+from collections import Counter
+from contextlib import contextmanager
+
+DEFAULT_INTERVAL = 0.005
+
+class SamplingProfiler:
+    """
+    Samples every thread's Python stack each `interval` seconds from a daemon
+    thread. Nothing is traced between samples, so the profiled code runs at
+    full speed. collapsed() returns "frame;frame;frame count" lines that
+    flamegraph.pl / speedscope read directly.
+    """
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = names.get(code)
+                    if label is None:
+                        label = names[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[";".join(stack)] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def top(self, n=20):
+        """(leaf function, samples) pairs, hottest first."""
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+@contextmanager
+def profile_to(path, interval=DEFAULT_INTERVAL):
+    """Profile the with-block and write folded stacks to path (no-op when path is falsy)."""
+    if not path:
+        yield None
+        return
+    prof = SamplingProfiler(interval).start()
+    try:
+        yield prof
+    finally:
+        prof.stop()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(prof.collapsed())
+        print(f"WROTE {sum(prof.samples.values())} profile samples to {path}")
@@ -0,0 +1,43 @@
+# serving/rising.py - fastest-rising workflows, ordered by history velocity
+import threading
+from serving.workflow_store import platform_key, country_key
+
+RISING_KEYS = ("velocity_7d", "velocity_30d", "acceleration")
+
+_lock = threading.Lock()
+
+def rising_order(snap, by="velocity_7d"):
+    """
+    Rows of the snapshot that carry velocity (scorer run with --history), sorted
+    by velocity[by] desc. Computed once per snapshot and kept on it.
+    """
+    cache = getattr(snap, "rising_orders", None)
+    if cache is None:
+        with _lock:
+            cache = getattr(snap, "rising_orders", None)
+            if cache is None:
+                cache = snap.rising_orders = {}
+    order = cache.get(by)
+    if order is None:
+        ranked = []
+        for rec in snap.select():
+            v = (rec.get("velocity") or {}).get(by)
+            if v is not None:
+                ranked.append((-v, len(ranked), rec))
+        ranked.sort(key=lambda x: (x[0], x[1]))
+        order = cache[by] = [rec for _, _, rec in ranked]
+    return order
+
+def top_rising(snap, platform=None, country=None, limit=20, by="velocity_7d"):
+    out = []
+    p = platform.lower() if platform else None
+    c = country.lower() if country else None
+    for rec in rising_order(snap, by):
+        if p and platform_key(rec.get("platform", "")) != p:
+            continue
+        if c and country_key(rec.get("country")) != c:
+            continue
+        out.append(rec)
+        if len(out) >= limit:
+            break
+    return out
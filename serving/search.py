@@ -0,0 +1,106 @@
+# serving/search.py - in-memory inverted index over workflow titles
+import bisect, math, threading
+from array import array
+from scripts.score_and_dedupe import norm_title
+from serving.workflow_store import platform_key, country_key, score_key
+
+# final rank = (1 - SCORE_WEIGHT) * relevance / best relevance + SCORE_WEIGHT * score / 100
+SCORE_WEIGHT = 0.3
+# postings are in score order, so capping keeps the best-scored matches
+MAX_CANDIDATES = 1000
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenize(text):
+    """Same normalisation as the dedupe key in score_and_dedupe.norm_title."""
+    return norm_title(text).split()
+
+class SearchIndex:
+    """
+    Postings map each title token to ascending row ids of the snapshot's full
+    selection (= descending score), and platform/country filters have postings
+    of their own, so a query is an intersection of sorted id lists.
+    """
+    def __init__(self, snap):
+        self.version = snap.version
+        rows = snap.select()
+        self._rows = rows
+        self.postings = {}
+        self.filters = {}
+        self.doc_len = array("H")
+        self.scores = array("d")
+        for i, rec in enumerate(rows):
+            tokens = tokenize(rec.get("workflow") or "")
+            self.doc_len.append(min(len(tokens), 65535))
+            s = score_key(rec)
+            self.scores.append(s if s != float("-inf") else 0.0)
+            tf = {}
+            for t in tokens:
+                tf[t] = tf.get(t, 0) + 1
+            for t, n in tf.items():
+                ids, counts = self.postings.setdefault(t, (array("I"), array("H")))
+                ids.append(i)
+                counts.append(min(n, 65535))
+            for key in (f"p:{platform_key(rec.get('platform', ''))}", f"c:{country_key(rec.get('country'))}"):
+                self.filters.setdefault(key, array("I")).append(i)
+        self.n = len(rows)
+        self.avg_len = (sum(self.doc_len) / self.n) if self.n else 0.0
+
+    def _idf(self, df):
+        return math.log(1 + (self.n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, platform=None, country=None, limit=20):
+        """Return [(rank, row id)] best first; every query token must match."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or any(t not in self.postings for t in terms):
+            return []
+        terms.sort(key=lambda t: len(self.postings[t][0]))
+        filters = [self.filters.get(key, array("I")) for key in
+                   ([f"p:{platform.lower()}"] if platform else []) + ([f"c:{country.lower()}"] if country else [])]
+        probes = [self.postings[t][0] for t in terms[1:]] + filters
+
+        def contains(ids, row):
+            j = bisect.bisect_left(ids, row)
+            return j < len(ids) and ids[j] == row
+
+        # walk the shortest postings list in score order, probing the others by bisection
+        candidates = []
+        for row in self.postings[terms[0]][0]:
+            if all(contains(ids, row) for ids in probes):
+                candidates.append(row)
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+        if not candidates:
+            return []
+
+        idfs = [self._idf(len(self.postings[t][0])) for t in terms]
+        scored = []
+        for row in candidates:
+            norm = 1 - BM25_B + BM25_B * (self.doc_len[row] / self.avg_len if self.avg_len else 1.0)
+            rel = 0.0
+            for t, idf in zip(terms, idfs):
+                ids, counts = self.postings[t]
+                tf = counts[bisect.bisect_left(ids, row)]
+                rel += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+            scored.append((rel, row))
+        best_rel = max(rel for rel, _ in scored) or 1.0
+        ranked = [((1 - SCORE_WEIGHT) * rel / best_rel + SCORE_WEIGHT * self.scores[row] / 100.0, row)
+                  for rel, row in scored]
+        ranked.sort(key=lambda x: (-x[0], x[1]))
+        return ranked[:limit]
+
+    def record(self, row):
+        return self._rows[row]
+
+_build_lock = threading.Lock()
+
+def index_for(snap):
+    """The snapshot's search index, built on first use and dropped with the snapshot."""
+    index = getattr(snap, "search_index", None)
+    if index is None:
+        with _build_lock:
+            index = getattr(snap, "search_index", None)
+            if index is None:
+                index = SearchIndex(snap)
+                snap.search_index = index
+    return index
@@ -0,0 +1,206 @@
+# serving/shard_router.py - scatter-gather front for shard workers, one dataset version per request
+# usage: python -m serving.shard_router --worker http://127.0.0.1:8001 --worker http://127.0.0.1:8002
+#        SHARD_WORKERS=http://127.0.0.1:8001,http://127.0.0.1:8002 uvicorn serving.shard_router:app
+#
+# The router reads CURRENT and the manifest from the shard root (shared with
+# the workers), pins the request to that version and asks each worker for the
+# top N of the shards it owns at that version. Workers keep the previous
+# version mapped, so a refresh landing mid-request cannot mix two versions.
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+import json, os, threading, time
+from serving.shards import shards_dir, read_current, load_manifest, shards_for, assignment, merge_ranked, stable_hash
+from serving.response_cache import ResponseCache, etag_matches
+from serving.workflow_store import dumps_compact
+from serving import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARD_ROOT = os.getenv("SHARD_ROOT", shards_dir(os.path.join(BASE_DIR, "data", "sample_workflows_scored.json")))
+SHARD_WORKERS = [w.rstrip("/") for w in os.getenv("SHARD_WORKERS", "").split(",") if w.strip()]
+WORKER_TIMEOUT = float(os.getenv("SHARD_WORKER_TIMEOUT", "5"))
+SPEC_RETRY_SECONDS = float(os.getenv("SHARD_SPEC_RETRY", "5"))   # unreachable workers are skipped this long
+
+app = FastAPI(title="n8n Workflow Popularity - Shard Router")
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
+RESPONSE_CACHE = ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")))
+FANOUT = metrics.histogram("api_shard_fanout_seconds", "Shard worker calls made by the router", ("worker",))
+_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="shard-fanout")
+
+class UnavailableError(Exception):
+    pass
+
+class StaleSpecError(UnavailableError):
+    """A worker no longer holds a shard its cached assignment spec claims."""
+
+class Cluster:
+    """
+    Workers' assignment specs (fetched once from /shard/info) and manifests per
+    version. A shard held by several workers is owned by one of them, picked by
+    a stable hash of its name. A worker whose /shard/info fails is left out
+    for SPEC_RETRY_SECONDS instead of being asked again on every request.
+    """
+    def __init__(self, root, workers):
+        self.root = root
+        self.workers = workers
+        self._specs = {}
+        self._failed = {}    # worker -> monotonic time of the next /shard/info attempt
+        self._manifests = {}
+        self._lock = threading.Lock()
+
+    def manifest(self, version):
+        with self._lock:
+            manifest = self._manifests.get(version)
+            if manifest is None:
+                manifest = self._manifests[version] = load_manifest(self.root, version)
+                if len(self._manifests) > 4:
+                    self._manifests.pop(next(iter(self._manifests)))
+        return manifest
+
+    def specs(self):
+        """{worker: holds predicate} of the reachable workers; missing specs are fetched in parallel."""
+        now = time.monotonic()
+        with self._lock:
+            specs = dict(self._specs)
+            missing = [w for w in self.workers if w not in specs and self._failed.get(w, 0) <= now]
+        for worker, fut in [(w, _POOL.submit(_get, w, "/shard/info")) for w in missing]:
+            try:
+                spec = assignment(json.loads(fut.result())["assignment"])
+            except (OSError, ValueError, KeyError):
+                with self._lock:
+                    self._failed[worker] = time.monotonic() + SPEC_RETRY_SECONDS
+                continue
+            with self._lock:
+                self._specs[worker] = specs[worker] = spec
+                self._failed.pop(worker, None)
+        return specs
+
+    def forget(self, worker):
+        with self._lock:
+            self._specs.pop(worker, None)
+
+    def owners(self, manifest, names):
+        """{worker: [shard names]} covering names; UnavailableError if a shard has no worker."""
+        specs = self.specs()
+        plan = {}
+        for name in names:
+            held = [w for w in self.workers if w in specs and specs[w](name, manifest["shards"][name])]
+            if not held:
+                raise UnavailableError(f"no worker holds shard {name}")
+            plan.setdefault(held[stable_hash(name) % len(held)], []).append(name)
+        return plan
+
+CLUSTER = Cluster(SHARD_ROOT, SHARD_WORKERS)
+
+def _get(worker, path, params=None):
+    # imported on first use: keeps the router's cold start at the FastAPI floor
+    from urllib.request import urlopen
+    url = worker + path + ("?" + urlencode(params) if params else "")
+    with FANOUT.time(worker=worker), urlopen(url, timeout=WORKER_TIMEOUT) as resp:
+        return resp.read()
+
+def _fetch_top(worker, version, names, platform, country, limit):
+    """[(rank, record JSON bytes)] from one worker, checked against the pinned version."""
+    params = {"version": version, "limit": limit, "shards": ",".join(names)}
+    if platform:
+        params["platform"] = platform
+    if country:
+        params["country"] = country
+    try:
+        lines = _get(worker, "/shard/top", params).split(b"\n")
+    except OSError as e:
+        CLUSTER.forget(worker)
+        if getattr(e, "code", None) == 404:   # HTTPError: reassigned since its spec was cached
+            raise StaleSpecError(f"shard worker {worker} no longer holds {','.join(names)}")
+        raise UnavailableError(f"shard worker {worker} failed: {e}")
+    head = json.loads(lines[0])
+    if head["version"] != version:
+        raise UnavailableError(f"shard worker {worker} answered version {head['version']}, expected {version}")
+    return list(zip(head["ranks"], lines[1:1 + len(head["ranks"])]))
+
+def scatter_top(version, platform=None, country=None, limit=100):
+    """
+    Top `limit` records over every shard the filter touches, merged by global
+    rank, as a JSON array. A worker answering 404 has its spec re-fetched and
+    the request is planned once more.
+    """
+    manifest = CLUSTER.manifest(version)
+    names = shards_for(manifest, platform, country)
+    for attempt in range(2):
+        plan = CLUSTER.owners(manifest, names)
+        futures = [_POOL.submit(_fetch_top, worker, version, owned, platform, country, limit)
+                   for worker, owned in plan.items()]
+        try:
+            runs = [f.result() for f in futures]
+            break
+        except StaleSpecError:
+            if attempt:
+                raise
+    return b"[" + b",".join(body for _, body in merge_ranked(runs, limit)) + b"]"
+
+def current_version():
+    try:
+        return read_current(SHARD_ROOT)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"no shards published under {SHARD_ROOT}; run the scorer with --shards")
+
+def routed_json(request, key, build):
+    """Like server.cached_json: build(version) -> bytes, cached per version, with ETag and X-Dataset-Version."""
+    version = current_version()
+    try:
+        entry = RESPONSE_CACHE.get_or_build((version,) + key, lambda: build(version))
+    except UnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "X-Dataset-Version": version}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        RESPONSE_CACHE.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.get("/shards")
+def shards():
+    """Current version, its shards with record counts, and the worker answering for each."""
+    version = current_version()
+    manifest = CLUSTER.manifest(version)
+    try:
+        owner = {name: worker for worker, names in CLUSTER.owners(manifest, manifest["shards"]).items()
+                 for name in names}
+    except UnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    body = {"version": version, "n": manifest["n"], "workers": SHARD_WORKERS,
+            "shards": {name: {"count": meta["count"], "worker": owner[name]} for name, meta in manifest["shards"].items()}}
+    return Response(content=dumps_compact(body), media_type="application/json", headers={"X-Dataset-Version": version})
+
+@app.get("/workflows")
+def workflows(request: Request, platform: Optional[str] = Query(None), country: Optional[str] = Query(None),
+              limit: int = Query(100, ge=1, le=1000)):
+    """Same body as server.py's /workflows over the scored dataset, gathered from the shard workers."""
+    key = ("workflows", (platform or "").lower(), (country or "").lower(), limit)
+    return routed_json(request, key, lambda version: scatter_top(version, platform, country, limit))
+
+@app.get("/workflows/scored")
+def workflows_scored(request: Request, limit: int = Query(100, ge=1, le=1000)):
+    return routed_json(request, ("scored", limit), lambda version: scatter_top(version, limit=limit))
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Route queries to shard workers and merge their results")
+    parser.add_argument("--worker", action="append", default=[], metavar="URL", help="shard worker base URL (repeatable)")
+    parser.add_argument("--root", default=None, help="shard root shared with the workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    if args.worker:
+        os.environ["SHARD_WORKERS"] = ",".join(args.worker)
+    if args.root is not None:
+        os.environ["SHARD_ROOT"] = args.root
+    uvicorn.run("serving.shard_router:app", host=args.host, port=args.port, workers=args.workers, access_log=False)
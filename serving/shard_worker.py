@@ -0,0 +1,82 @@
+# serving/shard_worker.py - API worker that maps only its assigned dataset shards
+# usage: python -m serving.shard_worker --assign "youtube:*" --port 8001
+#        SHARD_ASSIGNMENT=0/2 uvicorn serving.shard_worker:app --port 8001
+# Queried by serving/shard_router.py; see serving/shards.py for the shard layout.
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import Response
+from typing import Optional
+import os
+from serving.shards import ShardStore, shards_dir
+from serving.workflow_store import dumps_compact
+from serving import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARD_ROOT = os.getenv("SHARD_ROOT", shards_dir(os.path.join(BASE_DIR, "data", "sample_workflows_scored.json")))
+SHARD_ASSIGNMENT = os.getenv("SHARD_ASSIGNMENT", "*")
+
+app = FastAPI(title="n8n Workflow Popularity - Shard Worker")
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
+STORE = ShardStore(SHARD_ROOT, SHARD_ASSIGNMENT)
+
+def shard_set(version=None):
+    try:
+        return STORE.get(version)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"dataset version {version or 'CURRENT'} not available under {SHARD_ROOT}")
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.get("/shard/info")
+def shard_info(version: Optional[str] = Query(None)):
+    """Assignment spec and the shards (with record counts) held for a version (default: CURRENT)."""
+    held = shard_set(version)
+    return Response(content=dumps_compact({"version": held.version, "assignment": SHARD_ASSIGNMENT,
+                                           "shards": {name: len(snap) for name, snap in held.shards.items()}}),
+                    media_type="application/json", headers={"X-Dataset-Version": held.version})
+
+@app.get("/shard/top")
+def shard_top(version: Optional[str] = Query(None), platform: Optional[str] = Query(None),
+              country: Optional[str] = Query(None), limit: int = Query(100, ge=1, le=1000),
+              shards: Optional[str] = Query(None)):
+    """
+    Best `limit` rows over the requested held shards as NDJSON: a header line
+    {"version", "ranks"} (global ranks, ascending), then one record per line.
+    """
+    held = shard_set(version)
+    try:
+        top = held.top(platform, country, limit, shards.split(",") if shards else None)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"shard {e.args[0]} is not held by this worker")
+    head = dumps_compact({"version": held.version, "ranks": [rank for rank, _ in top]})
+    return Response(content=b"\n".join([head] + [body for _, body in top]) + b"\n",
+                    media_type="application/x-ndjson", headers={"X-Dataset-Version": held.version})
+
+@app.get("/workflows")
+def workflows(platform: Optional[str] = Query(None), country: Optional[str] = Query(None),
+              limit: int = Query(100, ge=1, le=1000)):
+    """Top records over this worker's shards only (the router's /workflows covers the whole dataset)."""
+    held = shard_set()
+    top = held.top(platform, country, limit)
+    return Response(content=b"[" + b",".join(body for _, body in top) + b"]",
+                    media_type="application/json", headers={"X-Dataset-Version": held.version})
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Serve an assigned subset of the dataset shards")
+    parser.add_argument("--assign", default=None,
+                        help='shards to hold: "*", "i/n" (hash partition) or "platform:country,..." patterns')
+    parser.add_argument("--root", default=None, help="shard root (default: next to the scored JSON)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    # uvicorn workers re-import the app, so the settings travel through the env
+    if args.assign is not None:
+        os.environ["SHARD_ASSIGNMENT"] = args.assign
+    if args.root is not None:
+        os.environ["SHARD_ROOT"] = args.root
+    uvicorn.run("serving.shard_worker:app", host=args.host, port=args.port, workers=args.workers, access_log=False)
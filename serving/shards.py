@@ -0,0 +1,183 @@
+# serving/shards.py - versioned (platform, country) shards of the scored dataset
+#
+# Layout under the shard root (data/sample_workflows_scored.shards/ by default):
+#   CURRENT                    name of the live version, replaced atomically
+#   <version>/manifest.json    {"version", "created", "n", "shards": {name: {platform, country, count, file}}}
+#   <version>/<name>.wfcol     one columnar file (serving/columnar.py) per (platform, country)
+# A version is the content hash of its shard files, so a version directory is
+# never modified once published. Every shard row carries its rank in the whole
+# dataset, so merging shards by rank reproduces the unsharded order exactly.
+import hashlib, heapq, itertools, json, os, re, shutil, threading, time
+from collections import OrderedDict
+from urllib.parse import quote
+from serving.columnar import ColumnarSnapshot, write_columnar, EXTENSION as COLUMNAR_EXTENSION
+from serving.workflow_store import platform_key, country_key, score_key
+
+EXTENSION = ".shards"
+CURRENT = "CURRENT"
+MANIFEST = "manifest.json"
+KEEP_VERSIONS = 3   # published versions kept on disk, so requests pinned to a previous one still resolve
+ALL = "*"
+_VERSION = re.compile(r"[0-9a-f]+")
+
+def shards_dir(json_path):
+    return os.path.splitext(json_path)[0] + EXTENSION
+
+def shard_name(platform, country):
+    """Shard of a lowercased (platform, country) pair, e.g. youtube@us (empty keys stay empty)."""
+    return f"{quote(platform, safe='')}@{quote(country, safe='')}"
+
+def stable_hash(name):
+    """Process- and host-independent hash of a shard name (hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=4).digest(), "big")
+
+def write_shards(root, records, keep=KEEP_VERSIONS):
+    """
+    Partition records by (platform, country), write them as a new version
+    directory and point CURRENT at it. Unchanged data maps to the existing
+    version. Returns (version, number of shards).
+    """
+    ranked = sorted(records, key=score_key, reverse=True)
+    parts = {}
+    for rank, rec in enumerate(ranked):
+        recs, ranks = parts.setdefault((platform_key(rec.get("platform", "")), country_key(rec.get("country"))), ([], []))
+        recs.append(rec)
+        ranks.append(rank)
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f".tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    digest = hashlib.blake2b(digest_size=8)
+    shards = {}
+    for (p, c), (recs, ranks) in sorted(parts.items()):
+        name = shard_name(p, c)
+        path = os.path.join(tmp, name + COLUMNAR_EXTENSION)
+        write_columnar(path, recs, ranks)
+        with open(path, "rb") as f:
+            digest.update(name.encode("utf-8") + b"\x00" + f.read())
+        shards[name] = {"platform": p, "country": c, "count": len(recs), "file": name + COLUMNAR_EXTENSION}
+    version = digest.hexdigest()
+    final = os.path.join(root, version)
+    if os.path.isdir(final):
+        shutil.rmtree(tmp)
+    else:
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "created": time.time(), "n": len(ranked), "shards": shards}, f, indent=2)
+        os.rename(tmp, final)
+    with open(os.path.join(root, CURRENT + ".tmp"), "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(os.path.join(root, CURRENT + ".tmp"), os.path.join(root, CURRENT))
+    prune_versions(root, keep)
+    return version, len(shards)
+
+def prune_versions(root, keep=KEEP_VERSIONS):
+    """Delete all but the `keep` newest versions (never the current one)."""
+    current = read_current(root)
+    created = []
+    for entry in os.listdir(root):
+        try:
+            with open(os.path.join(root, entry, MANIFEST), encoding="utf-8") as f:
+                created.append((json.load(f)["created"], entry))
+        except (OSError, ValueError, KeyError):
+            continue
+    created.sort(reverse=True)
+    for _, version in created[keep:]:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+def read_current(root):
+    """The live version name (FileNotFoundError before the first write_shards)."""
+    with open(os.path.join(root, CURRENT), encoding="utf-8") as f:
+        return f.read().strip()
+
+def load_manifest(root, version):
+    with open(os.path.join(root, version, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+def shards_for(manifest, platform=None, country=None):
+    """Names of the shards a (platform, country) filter touches, in manifest order."""
+    p = platform.lower() if platform else None
+    c = country.lower() if country else None
+    return [name for name, meta in manifest["shards"].items()
+            if (p is None or meta["platform"] == p) and (c is None or meta["country"] == c)]
+
+def assignment(spec):
+    """
+    Predicate (name, manifest entry) -> held, for a worker's assignment spec:
+    empty or "*" holds everything; "i/n" holds the i-th of n partitions by a
+    stable hash of the shard name; otherwise comma-separated platform:country
+    patterns where either side may be "*" (e.g. "youtube:*,discourse:us").
+    """
+    spec = (spec or "").strip()
+    if not spec or spec == ALL:
+        return lambda name, meta: True
+    if "/" in spec:
+        i, n = (int(x) for x in spec.split("/", 1))
+        if not 0 <= i < n:
+            raise ValueError(f"invalid shard assignment {spec!r}")
+        return lambda name, meta: stable_hash(name) % n == i
+    patterns = []
+    for part in spec.split(","):
+        p, _, c = part.strip().partition(":")
+        patterns.append((p.lower() or ALL, c.lower() or ALL))
+    return lambda name, meta: any((p == ALL or p == meta["platform"]) and (c == ALL or c == meta["country"])
+                                  for p, c in patterns)
+
+def merge_ranked(runs, limit):
+    """Merge rank-ascending [(rank, item)] runs into the first `limit` pairs overall."""
+    return list(itertools.islice(heapq.merge(*runs, key=lambda pair: pair[0]), limit))
+
+class ShardSet:
+    """One version's shards held by a worker, each an mmap'd ColumnarSnapshot."""
+    def __init__(self, root, version, spec=None):
+        self.version = version
+        self.manifest = load_manifest(root, version)
+        held = assignment(spec)
+        self.shards = {name: ColumnarSnapshot(os.path.join(root, version, meta["file"]))
+                       for name, meta in self.manifest["shards"].items() if held(name, meta)}
+
+    def top(self, platform=None, country=None, limit=100, names=None):
+        """
+        [(global rank, record JSON bytes)] of the best `limit` rows over the
+        shards matching the filter, among `names` (default: every held shard);
+        KeyError for a named shard that is not held.
+        """
+        names = set(self.shards if names is None else names)
+        wanted = [name for name in shards_for(self.manifest, platform, country) if name in names]
+        runs = []
+        for name in wanted:
+            snap = self.shards[name]
+            rows = range(min(limit, len(snap)))
+            runs.append([(snap.rank[i], snap.record_bytes(i)) for i in rows])
+        return merge_ranked(runs, limit)
+
+class ShardStore:
+    """
+    A worker's view of the shard root. get() returns the CURRENT version's
+    held shards, or an explicitly requested earlier version, so a router can
+    pin every part of one request to the same snapshot across a refresh.
+    The `keep` most recently used versions stay mapped.
+    """
+    def __init__(self, root, spec=None, keep=2):
+        self.root = root
+        self.spec = spec
+        self.keep = keep
+        assignment(spec)  # reject a bad spec at startup
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def current_version(self):
+        return read_current(self.root)
+
+    def get(self, version=None):
+        version = version or self.current_version()
+        with self._lock:
+            shard_set = self._sets.get(version)
+            if shard_set is None:
+                if not _VERSION.fullmatch(version) or not os.path.isdir(os.path.join(self.root, version)):
+                    raise FileNotFoundError(f"dataset version {version} not found")
+                shard_set = self._sets[version] = ShardSet(self.root, version, self.spec)
+                while len(self._sets) > self.keep:
+                    self._sets.popitem(last=False)
+            self._sets.move_to_end(version)
+        return shard_set
@@ -0,0 +1,108 @@
+# serving/workflow_store.py - long-lived, indexed view over a workflow JSON file
+import json, os, threading
+from collectors.records import encode, record_hook, to_plain, paused_gc
+
+def platform_key(value):
+    return str(value if value is not None else "").lower()
+
+def country_key(value):
+    return (value or "").lower()
+
+def dumps_compact(obj):
+    """Same bytes as fastapi's JSONResponse renders for obj."""
+    return json.dumps(to_plain(obj), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+                      default=encode).encode("utf-8")
+
+def to_json(records):
+    """Encode a selection (list of dicts, or a columnar row view) as a JSON array."""
+    if hasattr(records, "json_bytes"):
+        return records.json_bytes()
+    return dumps_compact(list(records))
+
+def iter_json(records):
+    """Yield each record of a selection as compact JSON bytes."""
+    if hasattr(records, "iter_json"):
+        yield from records.iter_json()
+    else:
+        for rec in records:
+            yield dumps_compact(rec)
+
+def score_key(rec):
+    # raw records carry score=None; keep them in file order behind scored ones
+    s = rec.get("score")
+    return s if isinstance(s, (int, float)) else float("-inf")
+
+class Snapshot:
+    """
+    One parsed version of a dataset file.
+    Records are kept sorted by score (desc, stable) and every index maps a
+    lowercased key to the score-ordered sublist, so a filtered top-N is a slice.
+    """
+    @classmethod
+    def load(cls, path, signature):
+        with open(path, "r", encoding="utf-8") as f, paused_gc():
+            return cls(json.load(f, object_hook=record_hook), signature)
+
+    def __init__(self, records, signature):
+        self.signature = signature
+        self.version = f"{signature[0]:x}-{signature[1]:x}"
+        self.records = sorted(records, key=score_key, reverse=True)
+        self.by_platform = {}
+        self.by_country = {}
+        self.by_pair = {}
+        for rec in self.records:
+            p = platform_key(rec.get("platform", ""))
+            c = country_key(rec.get("country"))
+            self.by_platform.setdefault(p, []).append(rec)
+            self.by_country.setdefault(c, []).append(rec)
+            self.by_pair.setdefault((p, c), []).append(rec)
+
+    def select(self, platform=None, country=None):
+        """Return the score-ordered list matching the filters (shared, do not mutate)."""
+        if platform and country:
+            return self.by_pair.get((platform.lower(), country.lower()), [])
+        if platform:
+            return self.by_platform.get(platform.lower(), [])
+        if country:
+            return self.by_country.get(country.lower(), [])
+        return self.records
+
+    def top(self, platform=None, country=None, limit=100):
+        return self.select(platform, country)[:limit]
+
+    def top_json(self, platform=None, country=None, limit=100):
+        return to_json(self.top(platform, country, limit))
+
+class WorkflowStore:
+    """
+    Loads a dataset once and re-loads it only when the file's (mtime, size)
+    signature changes. Safe to share across request threads. snapshot_cls
+    decides the file format (Snapshot for JSON, columnar.ColumnarSnapshot).
+    """
+    def __init__(self, path, snapshot_cls=Snapshot):
+        self.path = path
+        self.snapshot_cls = snapshot_cls
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _signature(self):
+        st = os.stat(self.path)  # FileNotFoundError propagates to the caller
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self):
+        sig = self._signature()
+        snap = self._snapshot
+        if snap is not None and snap.signature == sig:
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            if snap is None or snap.signature != sig:
+                snap = self.snapshot_cls.load(self.path, sig)
+                self._snapshot = snap
+        return snap
+
+    def top(self, platform=None, country=None, limit=100):
+        return self.snapshot().top(platform, country, limit)
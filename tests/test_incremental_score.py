@@ -0,0 +1,58 @@
+# tests/test_incremental_score.py - IncrementalScorer against the batch scorer
+import copy
+from collectors.checkpoint import record_key
+from collectors.records import as_record, to_plain
+from scripts.score_and_dedupe import pick_bests, merge_clusters, score_groups
+from scripts.incremental_score import IncrementalScorer
+
+def video(vid, title, views, likes=10, comments=2):
+    return {"workflow": title, "platform": "YouTube",
+            "popularity_metrics": {"views": views, "likes": likes, "comments": comments},
+            "country": "US", "source_url": f"https://www.youtube.com/watch?v={vid}",
+            "collected_at": "2025-01-01T00:00:00Z"}
+
+def topic(tid, title, views, replies=3):
+    return {"workflow": title, "platform": "Discourse",
+            "popularity_metrics": {"views": views, "replies": replies, "likes": 4, "contributors": 2},
+            "country": "", "source_url": f"https://community.n8n.io/t/{tid}",
+            "collected_at": "2025-01-01T00:00:00Z"}
+
+RECORDS = [
+    video("aaaaaaaaaaa", "Gmail automation", 1000, likes=7),
+    video("bbbbbbbbbbb", "gmail  automation!", 1000, likes=50),   # same group, tied views: first wins
+    topic(1, "Slack integration", 300),
+    video("ccccccccccc", "Google Sheets sync", 5000),
+    video("aaaaaaaaaaa", "Gmail automation", 1200, likes=9),      # duplicate key: replaces the first
+    topic(2, "Slack integration", 300, replies=9),
+    topic(1, "Slack integration v2", 250),                        # duplicate key moving to another group
+    video("ddddddddddd", "Webhook basics", 0),
+]
+
+def batch(records):
+    return [to_plain(r) for r in score_groups(merge_clusters(pick_bests(copy.deepcopy(records))))]
+
+def test_upsert_leaves_records_unchanged():
+    # records (as iter_records yields them) are kept as upserted, not converted
+    records = [as_record(r) for r in copy.deepcopy(RECORDS)]
+    scorer = IncrementalScorer()
+    scorer.upsert(records)
+    scorer.ranked()
+    assert [to_plain(r) for r in records] == RECORDS
+
+def test_ranked_matches_batch_with_duplicates():
+    latest = {}
+    for r in RECORDS:
+        latest[record_key(r)] = r
+    assert len(latest) < len(RECORDS)
+    scorer = IncrementalScorer()
+    scorer.upsert(copy.deepcopy(RECORDS))
+    assert [to_plain(r) for r in scorer.ranked()] == batch(list(latest.values()))
+
+def test_ranked_matches_batch_across_upserts():
+    scorer = IncrementalScorer()
+    for r in RECORDS:
+        scorer.upsert([copy.deepcopy(r)])
+    latest = {}
+    for r in RECORDS:
+        latest[record_key(r)] = r
+    assert [to_plain(r) for r in scorer.ranked()] == batch(list(latest.values()))